@@ -1,19 +1,38 @@
 from __future__ import annotations
 
+import base64
+import csv
+import hashlib
+import io
+import json
 import os
+import queue
+import re
+import shutil
 import sqlite3
+import tempfile
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from collections.abc import Iterable
 from datetime import datetime
+from fractions import Fraction
 
-from flask import Flask, redirect, render_template, request, url_for
-from werkzeug.utils import secure_filename
+import click
+from flask import Flask, Request, g, jsonify, redirect, render_template, request, send_file, url_for
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import cached_property, secure_filename
 
+from PIL import Image, ImageOps, features
 from reportlab.lib.units import mm
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.pdfgen import canvas
 
 
 APP_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(APP_DIR, "tailor.db")
+DB_PATH = os.environ.get("TAILOR_DB_PATH", os.path.join(APP_DIR, "tailor.db"))
 THERMAL_WIDTH = 80 * mm   # 80mm paper width
 
 app = Flask(__name__)
@@ -28,15 +47,330 @@ REQ_ICON_FOLDER = os.path.join(APP_DIR, "static", "req_icons")
 os.makedirs(REQ_ICON_FOLDER, exist_ok=True)
 app.config["REQ_ICON_FOLDER"] = REQ_ICON_FOLDER
 
+app.config["DB_POOL_SIZE"] = int(os.environ.get("TAILOR_DB_POOL_SIZE", "8"))
+app.config["DB_POOL_TIMEOUT"] = float(os.environ.get("TAILOR_DB_POOL_TIMEOUT", "10"))
+app.config["DB_PROFILE"] = os.environ.get("TAILOR_DB_PROFILE", "wal")
+app.config["DB_BUSY_TIMEOUT_MS"] = int(os.environ.get("TAILOR_DB_BUSY_TIMEOUT_MS", "5000"))
+app.config["DB_CHECKPOINT_INTERVAL"] = float(os.environ.get("TAILOR_DB_CHECKPOINT_INTERVAL", "60"))
+app.config["RENDER_WORKERS"] = int(os.environ.get("TAILOR_RENDER_WORKERS", "1"))
+app.config["RENDER_MAX_ATTEMPTS"] = int(os.environ.get("TAILOR_RENDER_MAX_ATTEMPTS", "3"))
+app.config["RENDER_RETRY_DELAY"] = float(os.environ.get("TAILOR_RENDER_RETRY_DELAY", "5"))
+# Bodies over MAX_CONTENT_LENGTH are refused from the Content-Length header
+# before anything is read; each uploaded file is capped as it streams in.
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("TAILOR_MAX_REQUEST_MB", "100")) * 1024 * 1024
+app.config["MAX_UPLOAD_FILE_SIZE"] = int(os.environ.get("TAILOR_MAX_UPLOAD_MB", "25")) * 1024 * 1024
+
+# Pragmas applied to every pooled connection. "wal" lets the counters write
+# while the dashboards read; "rollback" is the SQLite default journal and is
+# kept for network filesystems where WAL is not supported.
+DB_PROFILES: dict[str, dict[str, int | str]] = {
+    "rollback": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+    },
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -32000,  # negative = KiB, so ~32 MB of page cache
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 1000,
+        "journal_size_limit": 64 * 1024 * 1024,
+    },
+}
+
+
+def db_pragmas(profile: str, busy_timeout_ms: int) -> dict[str, int | str]:
+    if profile not in DB_PROFILES:
+        raise ValueError(f"unknown database profile {profile!r}")
+    # busy_timeout goes first so switching journal_mode waits out a writer.
+    return {"busy_timeout": busy_timeout_ms, **DB_PROFILES[profile]}
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        path: str,
+        size: int,
+        timeout: float,
+        pragmas: dict[str, int | str] | None = None,
+        checkpoint_interval: float = 0,
+    ) -> None:
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = pragmas or {}
+        self.checkpoint_interval = checkpoint_interval
+        self._checkpointer: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._checkpoints = 0
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._checkouts = 0
+        self._reused = 0
+        self._waits = 0
+        self._in_use = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    @property
+    def uses_wal(self) -> bool:
+        return str(self.pragmas.get("journal_mode", "")).upper() == "WAL"
+
+    def _start_checkpointer(self) -> None:
+        # Started on first connect rather than at import so forked workers
+        # each get their own thread.
+        if not self.uses_wal or self.checkpoint_interval <= 0:
+            return
+        with self._lock:
+            if self._checkpointer is not None:
+                return
+            self._checkpointer = threading.Thread(
+                target=self._checkpoint_loop, name="wal-checkpoint", daemon=True
+            )
+        self._checkpointer.start()
 
-def get_db() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    def _checkpoint_loop(self) -> None:
+        conn = self._connect()
+        try:
+            while not self._stop.wait(self.checkpoint_interval):
+                self.checkpoint(conn)
+        finally:
+            conn.close()
+
+    def checkpoint(self, conn: sqlite3.Connection | None = None) -> tuple[int, int, int]:
+        # TRUNCATE resets the WAL file but needs a quiet moment; while requests
+        # are in flight fall back to PASSIVE, which never blocks them.
+        with self._lock:
+            idle = self._in_use == 0
+        mode = "TRUNCATE" if idle else "PASSIVE"
+        owns_conn = conn is None
+        conn = conn or self._connect()
+        try:
+            busy, log_frames, checkpointed = conn.execute(
+                f"PRAGMA wal_checkpoint({mode})"
+            ).fetchone()
+        except sqlite3.Error:
+            return (1, -1, -1)
+        finally:
+            if owns_conn:
+                conn.close()
+        with self._lock:
+            self._checkpoints += 1
+        return (busy, log_frames, checkpointed)
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            conn = self._idle.get_nowait()
+            reused = True
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    conn = self._connect()
+                except sqlite3.Error:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+                self._start_checkpointer()
+                reused = False
+            else:
+                with self._lock:
+                    self._waits += 1
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise sqlite3.OperationalError(
+                        f"no database connection available after {self.timeout}s"
+                    ) from None
+                reused = True
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+            if reused:
+                self._reused += 1
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # A broken connection is dropped so the next checkout opens a fresh one.
+            conn.close()
+            with self._lock:
+                self._created -= 1
+                self._in_use -= 1
+            return
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+
+    def close_all(self) -> None:
+        self._stop.set()
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def metrics(self) -> dict[str, float | int]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "checkouts": self._checkouts,
+                "reused": self._reused,
+                "waits": self._waits,
+                "reuse_ratio": round(self._reused / self._checkouts, 4) if self._checkouts else 0.0,
+                "checkpoints": self._checkpoints,
+            }
+
+
+db_pool = ConnectionPool(
+    DB_PATH,
+    app.config["DB_POOL_SIZE"],
+    app.config["DB_POOL_TIMEOUT"],
+    pragmas=db_pragmas(app.config["DB_PROFILE"], app.config["DB_BUSY_TIMEOUT_MS"]),
+    checkpoint_interval=app.config["DB_CHECKPOINT_INTERVAL"],
+)
 
 
-def init_db() -> None:
-    conn = get_db()
+def get_db() -> sqlite3.Connection:
+    # One pooled connection per app context; handed back in release_db().
+    if "db" not in g:
+        g.db = db_pool.acquire()
+    return g.db
+
+
+@app.teardown_appcontext
+def release_db(exc: BaseException | None) -> None:
+    conn = g.pop("db", None)
+    if conn is not None:
+        db_pool.release(conn)
+
+
+class TTLCache:
+    def __init__(self, ttl: float, max_entries: int = 128) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: dict[object, tuple[float, object]] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key: object, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+        value = loader()
+        with self._lock:
+            # A write that invalidated while we were loading wins; the value
+            # is still returned to this caller but not kept.
+            if generation == self._generation and self.ttl > 0:
+                if len(self._entries) >= self.max_entries:
+                    self._entries.pop(next(iter(self._entries)))
+                self._entries[key] = (now + self.ttl, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+class LRUCache:
+    """Bounded map that evicts the least recently used key; entries never expire.
+
+    Meant for data whose writers invalidate it: a key stays until it is
+    invalidated or pushed out by newer ones. Writes made by other processes
+    are caught by passing a ``version`` read from the database; when it
+    changes every entry is dropped.
+    """
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[object, object] = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._version: object = None
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: list, loader, version: object = None) -> dict:
+        """Values for ``keys``; ``loader(missing)`` fetches all misses in one call."""
+        found = {}
+        with self._lock:
+            if version != self._version:
+                self._generation += 1
+                self._entries.clear()
+                self._version = version
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+            missing = [key for key in keys if key not in found]
+            self.hits += len(found)
+            self.misses += len(missing)
+            generation = self._generation
+        if not missing:
+            return found
+        loaded = loader(missing)
+        with self._lock:
+            # Same rule as TTLCache: an invalidation during the load wins.
+            if generation == self._generation:
+                for key in missing:
+                    self._entries[key] = loaded[key]
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        found.update(loaded)
+        return found
+
+    def invalidate(self, *keys: object) -> None:
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+# Per-process; other workers pick up writes within the TTL.
+dashboard_cache = TTLCache(float(os.environ.get("TAILOR_DASHBOARD_CACHE_TTL", "30")))
+# Keystroke-level typeahead results, keyed by the normalized query.
+suggest_cache = TTLCache(float(os.environ.get("TAILOR_SUGGEST_CACHE_TTL", "60")), max_entries=1024)
+# One entry: the reference-data bundle for the current reference version.
+reference_cache = LRUCache(max_entries=1)
+# Latest measurement set per kind, by customer id. Invalidated by the
+# measurement writers, so it has no TTL.
+measurement_cache = LRUCache(int(os.environ.get("TAILOR_MEASUREMENT_CACHE_SIZE", "512")))
+
+
+def migration_0001_base_schema(conn: sqlite3.Connection) -> None:
     cur = conn.cursor()
 
     #Salary
@@ -552,395 +886,2961 @@ def init_db() -> None:
             customer_id = customer_ids.get(phone)
             if not customer_id:
                 continue
-            create_measurement(customer_id, kind, fields, conn)
+            insert_legacy_measurement(conn, customer_id, kind, fields)
 
-    conn.commit()
-    conn.close()
 
+def migration_0002_query_indexes(conn: sqlite3.Connection) -> None:
+    cur = conn.cursor()
+    for statement in (
+        "CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_orders_status_created_at ON orders (status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_orders_due_date ON orders (due_date)",
+        # Partial index over the open queue, in the dashboard's due-date order.
+        """
+        CREATE INDEX IF NOT EXISTS idx_orders_open_due
+        ON orders (due_date IS NULL, due_date)
+        WHERE status != 'Completed'
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_orders_customer_created_at ON orders (customer_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items (order_id)",
+        "CREATE INDEX IF NOT EXISTS idx_order_items_type_order ON order_items (item_type, order_id)",
+        "CREATE INDEX IF NOT EXISTS idx_order_images_order_id ON order_images (order_id)",
+        "CREATE INDEX IF NOT EXISTS idx_measurements_customer_kind ON measurements (customer_id, kind, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_customers_name ON customers (name)",
+        "CREATE INDEX IF NOT EXISTS idx_inventory_name ON inventory (name)",
+        "CREATE INDEX IF NOT EXISTS idx_inventory_qty ON inventory (qty)",
+        "CREATE INDEX IF NOT EXISTS idx_vendors_created_at ON vendors (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_vendor_purchases_vendor ON vendor_purchases (vendor_id, purchased_at, total_price)",
+        "CREATE INDEX IF NOT EXISTS idx_vendor_purchases_purchased_at ON vendor_purchases (purchased_at)",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_created_at ON expenses (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_salaries_expense_id ON salaries (expense_id)",
+    ):
+        cur.execute(statement)
+    cur.execute("ANALYZE")
+
+
+# Running totals the dashboards read instead of aggregating whole tables.
+# Each entry is the query that recomputes it; the triggers created in
+# migration 0003 keep the stored values in step with every write.
+STATS_QUERIES = {
+    "orders_total": "SELECT COUNT(*) FROM orders",
+    "order_items_qty": "SELECT COALESCE(SUM(qty), 0) FROM order_items",
+    "inventory_qty": "SELECT COALESCE(SUM(qty), 0) FROM inventory",
+    "inventory_low_stock": "SELECT COUNT(*) FROM inventory WHERE qty <= 5",
+    "revenue": "SELECT COALESCE(SUM(total_amount), 0) FROM orders WHERE paid_at IS NOT NULL",
+    "vendor_spent": "SELECT COALESCE(SUM(total_price), 0) FROM vendor_purchases",
+    "expense_total": "SELECT COALESCE(SUM(amount), 0) FROM expenses",
+    "salary_total": "SELECT COALESCE(SUM(salary_amount), 0) FROM salaries",
+}
+
+STATS_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_orders_insert AFTER INSERT ON orders
+    BEGIN
+        UPDATE stats SET value = value + 1 WHERE key = 'orders_total';
+        INSERT OR IGNORE INTO stats (key, value) VALUES ('orders_status:' || NEW.status, 0);
+        UPDATE stats SET value = value + 1 WHERE key = 'orders_status:' || NEW.status;
+        UPDATE stats SET value = value + COALESCE(NEW.total_amount, 0)
+        WHERE key = 'revenue' AND NEW.paid_at IS NOT NULL;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_orders_delete AFTER DELETE ON orders
+    BEGIN
+        UPDATE stats SET value = value - 1 WHERE key = 'orders_total';
+        UPDATE stats SET value = value - 1 WHERE key = 'orders_status:' || OLD.status;
+        UPDATE stats SET value = value - COALESCE(OLD.total_amount, 0)
+        WHERE key = 'revenue' AND OLD.paid_at IS NOT NULL;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_orders_update
+    AFTER UPDATE OF status, total_amount, paid_at ON orders
+    BEGIN
+        UPDATE stats SET value = value - 1 WHERE key = 'orders_status:' || OLD.status;
+        INSERT OR IGNORE INTO stats (key, value) VALUES ('orders_status:' || NEW.status, 0);
+        UPDATE stats SET value = value + 1 WHERE key = 'orders_status:' || NEW.status;
+        UPDATE stats
+        SET value = value
+            + CASE WHEN NEW.paid_at IS NOT NULL THEN COALESCE(NEW.total_amount, 0) ELSE 0 END
+            - CASE WHEN OLD.paid_at IS NOT NULL THEN COALESCE(OLD.total_amount, 0) ELSE 0 END
+        WHERE key = 'revenue';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_order_items_insert AFTER INSERT ON order_items
+    BEGIN
+        UPDATE stats SET value = value + NEW.qty WHERE key = 'order_items_qty';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_order_items_delete AFTER DELETE ON order_items
+    BEGIN
+        UPDATE stats SET value = value - OLD.qty WHERE key = 'order_items_qty';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_order_items_update AFTER UPDATE OF qty ON order_items
+    BEGIN
+        UPDATE stats SET value = value + NEW.qty - OLD.qty WHERE key = 'order_items_qty';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_inventory_insert AFTER INSERT ON inventory
+    BEGIN
+        UPDATE stats SET value = value + NEW.qty WHERE key = 'inventory_qty';
+        UPDATE stats SET value = value + (NEW.qty <= 5) WHERE key = 'inventory_low_stock';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_inventory_delete AFTER DELETE ON inventory
+    BEGIN
+        UPDATE stats SET value = value - OLD.qty WHERE key = 'inventory_qty';
+        UPDATE stats SET value = value - (OLD.qty <= 5) WHERE key = 'inventory_low_stock';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_inventory_update AFTER UPDATE OF qty ON inventory
+    BEGIN
+        UPDATE stats SET value = value + NEW.qty - OLD.qty WHERE key = 'inventory_qty';
+        UPDATE stats SET value = value + (NEW.qty <= 5) - (OLD.qty <= 5)
+        WHERE key = 'inventory_low_stock';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_vendor_purchases_insert AFTER INSERT ON vendor_purchases
+    BEGIN
+        UPDATE stats SET value = value + NEW.total_price WHERE key = 'vendor_spent';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_vendor_purchases_delete AFTER DELETE ON vendor_purchases
+    BEGIN
+        UPDATE stats SET value = value - OLD.total_price WHERE key = 'vendor_spent';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_vendor_purchases_update
+    AFTER UPDATE OF total_price ON vendor_purchases
+    BEGIN
+        UPDATE stats SET value = value + NEW.total_price - OLD.total_price WHERE key = 'vendor_spent';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_expenses_insert AFTER INSERT ON expenses
+    BEGIN
+        UPDATE stats SET value = value + NEW.amount WHERE key = 'expense_total';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_expenses_delete AFTER DELETE ON expenses
+    BEGIN
+        UPDATE stats SET value = value - OLD.amount WHERE key = 'expense_total';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_expenses_update AFTER UPDATE OF amount ON expenses
+    BEGIN
+        UPDATE stats SET value = value + NEW.amount - OLD.amount WHERE key = 'expense_total';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_salaries_insert AFTER INSERT ON salaries
+    BEGIN
+        UPDATE stats SET value = value + NEW.salary_amount WHERE key = 'salary_total';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_salaries_delete AFTER DELETE ON salaries
+    BEGIN
+        UPDATE stats SET value = value - OLD.salary_amount WHERE key = 'salary_total';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_salaries_update AFTER UPDATE OF salary_amount ON salaries
+    BEGIN
+        UPDATE stats SET value = value + NEW.salary_amount - OLD.salary_amount
+        WHERE key = 'salary_total';
+    END
+    """,
+]
 
-@app.before_request
-def ensure_db_ready() -> None:
-    global _db_ready
-    if not _db_ready:
-        init_db()
-        _db_ready = True
 
+def compute_stats(conn: sqlite3.Connection) -> dict[str, float]:
+    values = {key: conn.execute(sql).fetchone()[0] for key, sql in STATS_QUERIES.items()}
+    for row in conn.execute("SELECT status, COUNT(*) FROM orders GROUP BY status"):
+        values[f"orders_status:{row[0]}"] = row[1]
+    return values
 
-def now_str() -> str:
-    return datetime.now().strftime("%Y-%m-%d %H:%M")
 
-def generate_expense_no(conn: sqlite3.Connection) -> str:
-    cur = conn.cursor()
-    cur.execute("SELECT expense_no FROM expenses ORDER BY id DESC LIMIT 1")
-    row = cur.fetchone()
+def read_stats(conn: sqlite3.Connection) -> dict[str, float]:
+    return {row["key"]: row["value"] for row in conn.execute("SELECT key, value FROM stats")}
 
-    if row:
-        last_num = int(row["expense_no"].split("-")[1])
-        return f"EXP-{last_num + 1:04d}"
 
-    return "EXP-0001"
+def rebuild_stats(conn: sqlite3.Connection) -> dict[str, tuple[float, float]]:
+    fresh = compute_stats(conn)
+    stored = read_stats(conn)
+    drift = {
+        key: (stored.get(key, 0), fresh.get(key, 0))
+        for key in sorted(stored.keys() | fresh.keys())
+        if abs(stored.get(key, 0) - fresh.get(key, 0)) > 1e-6
+    }
+    conn.execute("DELETE FROM stats")
+    conn.executemany("INSERT INTO stats (key, value) VALUES (?, ?)", fresh.items())
+    return drift
 
-def generate_expense_pdf_80mm(
-    expense_no: str,
-    name: str,
-    amount: float,
-    created_at: str,
-    is_salary: bool = False,
-    staff_no: str | None = None
-):
-    folder = os.path.join(APP_DIR, "static", "expense_pdfs")
-    os.makedirs(folder, exist_ok=True)
 
-    file_path = os.path.join(folder, f"{expense_no}.pdf")
+def migration_0003_stats_counters(conn: sqlite3.Connection) -> None:
+    cur = conn.cursor()
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS stats (
+            key TEXT PRIMARY KEY,
+            value REAL NOT NULL DEFAULT 0
+        )
+        """
+    )
+    for statement in STATS_TRIGGERS:
+        cur.execute(statement)
+    rebuild_stats(conn)
 
-    height = 140 * mm
-    pdf = canvas.Canvas(file_path, pagesize=(THERMAL_WIDTH, height))
 
-    y = height - 10 * mm
+# search_index rowids encode the source row as id * 4 + kind, so triggers can
+# update or delete an entry by rowid without an extra lookup.
+SEARCH_KINDS = {1: "customer", 2: "order", 3: "item"}
 
-    def line(text, bold=False):
-        nonlocal y
-        pdf.setFont("Helvetica-Bold" if bold else "Helvetica", 9)
-        pdf.drawString(5 * mm, y, text)
-        y -= 5 * mm
+SEARCH_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS search_customers_insert AFTER INSERT ON customers
+    BEGIN
+        INSERT INTO search_index (rowid, title, body)
+        VALUES (NEW.id * 4 + 1, NEW.name || ' ' || NEW.phone, COALESCE(NEW.notes, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_customers_update
+    AFTER UPDATE OF name, phone, notes ON customers
+    BEGIN
+        UPDATE search_index
+        SET title = NEW.name || ' ' || NEW.phone, body = COALESCE(NEW.notes, '')
+        WHERE rowid = NEW.id * 4 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_customers_delete AFTER DELETE ON customers
+    BEGIN
+        DELETE FROM search_index WHERE rowid = OLD.id * 4 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_orders_insert AFTER INSERT ON orders
+    BEGIN
+        INSERT INTO search_index (rowid, title, body)
+        VALUES (NEW.id * 4 + 2, NEW.id, COALESCE(NEW.notes, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_orders_update AFTER UPDATE OF notes ON orders
+    BEGIN
+        UPDATE search_index SET body = COALESCE(NEW.notes, '') WHERE rowid = NEW.id * 4 + 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_orders_delete AFTER DELETE ON orders
+    BEGIN
+        DELETE FROM search_index WHERE rowid = OLD.id * 4 + 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_order_items_insert AFTER INSERT ON order_items
+    BEGIN
+        INSERT INTO search_index (rowid, title, body)
+        VALUES (NEW.id * 4 + 3, NEW.item_type, COALESCE(NEW.notes, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_order_items_update
+    AFTER UPDATE OF item_type, notes ON order_items
+    BEGIN
+        UPDATE search_index
+        SET title = NEW.item_type, body = COALESCE(NEW.notes, '')
+        WHERE rowid = NEW.id * 4 + 3;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_order_items_delete AFTER DELETE ON order_items
+    BEGIN
+        DELETE FROM search_index WHERE rowid = OLD.id * 4 + 3;
+    END
+    """,
+]
 
-    # HEADER
-    line("PREMIER TAILORS", bold=True)
-    line("Salary Receipt" if is_salary else "Expense Receipt", bold=True)
-    line("-" * 32)
 
-    # INFO
-    line(f"Receipt No : {expense_no}")
-    line(f"Date       : {created_at}")
+def migration_0004_search_index(conn: sqlite3.Connection) -> None:
+    cur = conn.cursor()
+    cur.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+            title,
+            body,
+            prefix = '2 3 4',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        """
+    )
+    for statement in SEARCH_TRIGGERS:
+        cur.execute(statement)
+    cur.execute("DELETE FROM search_index")
+    cur.execute(
+        """
+        INSERT INTO search_index (rowid, title, body)
+        SELECT id * 4 + 1, name || ' ' || phone, COALESCE(notes, '') FROM customers
+        """
+    )
+    cur.execute(
+        """
+        INSERT INTO search_index (rowid, title, body)
+        SELECT id * 4 + 2, id, COALESCE(notes, '') FROM orders
+        """
+    )
+    cur.execute(
+        """
+        INSERT INTO search_index (rowid, title, body)
+        SELECT id * 4 + 3, item_type, COALESCE(notes, '') FROM order_items
+        """
+    )
+    cur.execute("INSERT INTO search_index (search_index) VALUES ('optimize')")
 
-    if is_salary and staff_no:
-        line(f"Staff No   : {staff_no}")
 
-    line("-" * 32)
+def backfill_phone_digits(conn: sqlite3.Connection) -> None:
+    rows = conn.execute("SELECT id, phone FROM customers WHERE phone_digits IS NULL").fetchall()
+    conn.executemany(
+        "UPDATE customers SET phone_digits = ? WHERE id = ?",
+        [(normalize_phone(row["phone"]), row["id"]) for row in rows],
+    )
 
-    # BODY
-    if is_salary:
-        line("Salary Paid To:")
-        line(name)
-        line(f"Salary Amount : Rs. {amount}", bold=True)
-    else:
-        line("Expense:")
-        line(name)
-        line(f"Amount : Rs. {amount}", bold=True)
 
-    line("-" * 32)
-    line("Thank you", bold=True)
-    line("System Generated")
+def migration_0005_phone_digits(conn: sqlite3.Connection) -> None:
+    cur = conn.cursor()
+    cur.execute("PRAGMA table_info(customers)")
+    if "phone_digits" not in [row[1] for row in cur.fetchall()]:
+        cur.execute("ALTER TABLE customers ADD COLUMN phone_digits TEXT")
+    backfill_phone_digits(conn)
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_customers_phone_digits ON customers (phone_digits)"
+    )
 
-    pdf.showPage()
-    pdf.save()
 
-def upsert_customer(name: str, phone: str, notes: str | None) -> int:
-    conn = get_db()
+def migration_0006_render_jobs(conn: sqlite3.Connection) -> None:
     cur = conn.cursor()
-    cur.execute("SELECT id FROM customers WHERE phone = ?", (phone,))
-    row = cur.fetchone()
-    if row:
-        cur.execute(
-            "UPDATE customers SET name = ?, notes = ? WHERE id = ?",
-            (name, notes, row["id"]),
-        )
-        customer_id = row["id"]
-    else:
-        cur.execute(
-            "INSERT INTO customers (name, phone, notes, created_at) VALUES (?, ?, ?, ?)",
-            (name, phone, notes, now_str()),
+    # run_after doubles as the retry backoff for queued jobs and the lease
+    # expiry for running ones, so a job held by a dead worker is picked up again.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS render_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            ref_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            run_after REAL NOT NULL DEFAULT 0,
+            output TEXT,
+            last_error TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
         )
-        customer_id = cur.lastrowid
-    conn.commit()
-    conn.close()
-    return int(customer_id)
-
+        """
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_render_jobs_due ON render_jobs (status, run_after)"
+    )
 
-def create_measurement(
-    customer_id: int,
-    kind: str,
-    fields: dict[str, str],
-    conn: sqlite3.Connection | None = None,
-) -> None:
-    values = {
-        "neck": fields.get("neck") or None,
-        "chest": fields.get("chest") or None,
-        "waist": fields.get("waist") or None,
-        "hip": fields.get("hip") or None,
-        "shoulder": fields.get("shoulder") or None,
-        "sleeve": fields.get("sleeve") or None,
-        "length": fields.get("length") or None,
-        "cuff": fields.get("cuff") or None,
-        "inseam": fields.get("inseam") or None,
-        "outseam": fields.get("outseam") or None,
-        "thigh": fields.get("thigh") or None,
-        "knee": fields.get("knee") or None,
-        "bottom": fields.get("bottom") or None,
-        "notes": fields.get("notes") or None,
-    }
-    if not any(values.values()):
-        return
 
-    owns_conn = conn is None
-    conn = conn or get_db()
-    conn.execute(
+# Fixed-prefix document numbers: sequence name -> (table, column, prefix).
+# Inventory codes use one "inventory:<prefix>" sequence per name prefix.
+SEQUENCE_SOURCES = {
+    "expense_no": ("expenses", "expense_no", "EXP-"),
+    "vendor_code": ("vendors", "vendor_code", "VND"),
+    "tailor_code": ("tailors", "tailor_code", "TLR"),
+}
+
+
+def seed_sequences(conn: sqlite3.Connection) -> None:
+    """Start every sequence after the highest number already issued."""
+    highest: dict[str, int] = {}
+    for name, (table, column, prefix) in SEQUENCE_SOURCES.items():
+        for (code,) in conn.execute(
+            f"SELECT {column} FROM {table} WHERE {column} LIKE ?", (f"{prefix}%",)
+        ):
+            suffix = code[len(prefix):]
+            if suffix.isdigit():
+                highest[name] = max(highest.get(name, 0), int(suffix))
+    codes = conn.execute("SELECT inventory_code FROM inventory WHERE inventory_code LIKE '%-%'")
+    highest.update(inventory_sequence_floors(code for (code,) in codes))
+    advance_sequences(conn, highest)
+
+
+def inventory_sequence_floors(codes: Iterable[str]) -> dict[str, int]:
+    """Highest number per "inventory:<prefix>" sequence among PREFIX-NNN codes."""
+    highest: dict[str, int] = {}
+    for code in codes:
+        prefix, _, suffix = code.rpartition("-")
+        if prefix and suffix.isdigit():
+            name = f"inventory:{prefix}"
+            highest[name] = max(highest.get(name, 0), int(suffix))
+    return highest
+
+
+def advance_sequences(conn: sqlite3.Connection, floors: dict[str, int]) -> None:
+    # Never moves a sequence backwards.
+    conn.executemany(
         """
-        INSERT INTO measurements (
-            customer_id, kind, neck, chest, waist, hip, shoulder, sleeve, length, cuff,
-            inseam, outseam, thigh, knee, bottom, notes, created_at
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        INSERT INTO sequences (name, value) VALUES (?, ?)
+        ON CONFLICT (name) DO UPDATE SET value = max(value, excluded.value)
         """,
-        (
-            customer_id,
-            kind,
-            values["neck"],
-            values["chest"],
-            values["waist"],
-            values["hip"],
-            values["shoulder"],
-            values["sleeve"],
-            values["length"],
-            values["cuff"],
-            values["inseam"],
-            values["outseam"],
-            values["thigh"],
-            values["knee"],
-            values["bottom"],
-            values["notes"],
-            now_str(),
-        ),
+        floors.items(),
     )
-    if owns_conn:
-        conn.commit()
-        conn.close()
-
-
-def generate_tailor_code() -> str:
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM tailors")
-    count = cur.fetchone()[0] + 1
-    conn.close()
-    return f"TLR{count:03d}"
 
 
-def generate_inventory_code(conn: sqlite3.Connection, name: str) -> str:
-    base = "".join(ch for ch in name.upper() if ch.isalnum())
-    prefix = base[:3] if len(base) >= 3 else (base or "INV")
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT inventory_code FROM inventory WHERE inventory_code LIKE ? ORDER BY id DESC LIMIT 1",
-        (f"{prefix}-%",),
+def migration_0007_sequences(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sequences (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """
     )
-    row = cur.fetchone()
-    if row and row["inventory_code"]:
-        try:
-            last_num = int(row["inventory_code"].split("-")[-1])
-            return f"{prefix}-{last_num + 1:03d}"
-        except ValueError:
-            pass
-    return f"{prefix}-001"
+    seed_sequences(conn)
 
 
-def generate_vendor_code(conn: sqlite3.Connection) -> str:
+def migration_0008_image_derivatives(conn: sqlite3.Connection) -> None:
     cur = conn.cursor()
-    cur.execute("SELECT vendor_code FROM vendors ORDER BY id DESC LIMIT 1")
-    row = cur.fetchone()
-    if row and row["vendor_code"] and row["vendor_code"].startswith("VND"):
-        try:
-            last_num = int(row["vendor_code"][3:])
-            return f"VND{last_num + 1:04d}"
-        except ValueError:
-            pass
-    cur.execute("SELECT COUNT(*) FROM vendors")
-    count = cur.fetchone()[0] + 1
-    return f"VND{count:04d}"
+    cur.execute("PRAGMA table_info(order_images)")
+    if "derived_at" not in [row[1] for row in cur.fetchall()]:
+        cur.execute("ALTER TABLE order_images ADD COLUMN derived_at TEXT")
 
-@app.route("/")
-def dashboard():
-    q = request.args.get("q", "").strip()
-    conn = get_db()
-    counts = {
-        row["status"]: row["total"]
-        for row in conn.execute(
-            "SELECT status, COUNT(*) as total FROM orders GROUP BY status"
-        ).fetchall()
-    }
-    totals = conn.execute(
-        "SELECT COUNT(*) AS total_orders FROM orders"
-    ).fetchone()
-    total_items = conn.execute(
-        "SELECT COALESCE(SUM(qty), 0) AS total_items FROM order_items"
-    ).fetchone()
-    stock_units = conn.execute(
-        "SELECT COALESCE(SUM(qty), 0) AS stock_units FROM inventory"
-    ).fetchone()
-    low_stock_count = conn.execute(
-        "SELECT COUNT(*) AS low_stock FROM inventory WHERE qty <= 5"
-    ).fetchone()
 
-    recent_orders = conn.execute(
+# Every order_images row holds one reference to its file; the blob is garbage
+# once refcount drops to zero (see `flask --app app gc-uploads`).
+UPLOAD_BLOB_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS upload_blobs_ref AFTER INSERT ON order_images
+    BEGIN
+        INSERT INTO upload_blobs (filename, refcount, created_at)
+        VALUES (NEW.filename, 1, strftime('%Y-%m-%d %H:%M', 'now', 'localtime'))
+        ON CONFLICT (filename) DO UPDATE SET refcount = refcount + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS upload_blobs_unref AFTER DELETE ON order_images
+    BEGIN
+        UPDATE upload_blobs SET refcount = refcount - 1 WHERE filename = OLD.filename;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS upload_blobs_move
+    AFTER UPDATE OF filename ON order_images
+    WHEN NEW.filename != OLD.filename
+    BEGIN
+        UPDATE upload_blobs SET refcount = refcount - 1 WHERE filename = OLD.filename;
+        INSERT INTO upload_blobs (filename, refcount, created_at)
+        VALUES (NEW.filename, 1, strftime('%Y-%m-%d %H:%M', 'now', 'localtime'))
+        ON CONFLICT (filename) DO UPDATE SET refcount = refcount + 1;
+    END
+    """,
+]
+
+
+def migration_0009_upload_blobs(conn: sqlite3.Connection) -> None:
+    conn.execute(
         """
-        SELECT orders.*, customers.name, customers.phone
-        FROM orders
-        JOIN customers ON customers.id = orders.customer_id
-        ORDER BY orders.created_at DESC
-        LIMIT 8
+        CREATE TABLE IF NOT EXISTS upload_blobs (
+            filename TEXT PRIMARY KEY,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL
+        ) WITHOUT ROWID
         """
-    ).fetchall()
-
-    active_orders = conn.execute(
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_order_images_filename ON order_images (filename)"
+    )
+    # Older uploads were saved under random names, so the same photo may be on
+    # disk several times. Point every copy at the first one; gc-uploads then
+    # removes the others once nothing references them.
+    canonical: dict[str, str] = {}
+    for (filename,) in conn.execute(
+        "SELECT DISTINCT filename FROM order_images ORDER BY filename"
+    ).fetchall():
+        path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
+        if not os.path.isfile(path):
+            continue
+        with open(path, "rb") as fh:
+            digest = hashlib.file_digest(fh, "sha256").hexdigest()
+        keep = canonical.setdefault(digest, filename)
+        if keep != filename:
+            conn.execute(
+                "UPDATE order_images SET filename = ?, derived_at = NULL WHERE filename = ?",
+                (keep, filename),
+            )
+    conn.execute(
         """
-        SELECT orders.*, customers.name, customers.phone
-        FROM orders
-        JOIN customers ON customers.id = orders.customer_id
-        WHERE orders.status != 'Completed'
-        ORDER BY orders.due_date IS NULL, orders.due_date ASC, orders.created_at DESC
-        LIMIT 8
+        INSERT OR REPLACE INTO upload_blobs (filename, refcount, created_at)
+        SELECT filename, COUNT(*), strftime('%Y-%m-%d %H:%M', 'now', 'localtime')
+        FROM order_images
+        GROUP BY filename
         """
-    ).fetchall()
+    )
+    for statement in UPLOAD_BLOB_TRIGGERS:
+        conn.execute(statement)
 
-    pickup_results = []
-    if q:
-        pickup_results = conn.execute(
-            """
-            SELECT customers.*,
-                   orders.id AS order_id,
-                   orders.status AS order_status,
-                   orders.due_date AS order_due,
-                   orders.notes AS order_notes
-            FROM customers
-            LEFT JOIN orders
-              ON orders.id = (
-                SELECT id FROM orders
-                WHERE customer_id = customers.id
-                ORDER BY created_at DESC
-                LIMIT 1
-              )
-            WHERE customers.name LIKE ? OR customers.phone LIKE ?
-            ORDER BY customers.name ASC
-            LIMIT 6
-            """,
-            (f"%{q}%", f"%{q}%"),
-        ).fetchall()
 
-    low_stock = conn.execute(
-        """
-        SELECT * FROM inventory
-        WHERE qty <= 5
-        ORDER BY qty ASC
-        LIMIT 6
-        """
-    ).fetchall()
+# The fixed REAL columns measurements had before migration 10.
+LEGACY_MEASURE_COLUMNS = (
+    "neck", "chest", "waist", "hip", "shoulder", "sleeve", "length",
+    "cuff", "inseam", "outseam", "thigh", "knee", "bottom",
+)
+
+
+def legacy_measure_subcategory(conn: sqlite3.Connection, kind: str) -> int:
+    """Subcategory id for a pre-migration-10 kind, created when missing.
+
+    order_new wrote "<category> - <subcategory>"; the seed data and blocks
+    saved without a subcategory only have the category name, and those land
+    in a "General" subcategory of it.
+    """
+    category, _, subcategory = kind.partition(" - ")
+    conn.execute(
+        "INSERT OR IGNORE INTO categories (name, measurement_type) VALUES (?, ?)",
+        (category, category),
+    )
+    category_id = conn.execute(
+        "SELECT id FROM categories WHERE name = ?", (category,)
+    ).fetchone()[0]
+    conn.execute(
+        "INSERT OR IGNORE INTO subcategories (category_id, name) VALUES (?, ?)",
+        (category_id, subcategory or "General"),
+    )
+    return conn.execute(
+        "SELECT id FROM subcategories WHERE category_id = ? AND name = ?",
+        (category_id, subcategory or "General"),
+    ).fetchone()[0]
 
-    shirt_queue = conn.execute(
+
+def migration_0010_measurement_values(conn: sqlite3.Connection) -> None:
+    cur = conn.cursor()
+    cur.execute("PRAGMA table_info(measurements)")
+    columns = [row[1] for row in cur.fetchall()]
+    if "subcategory_id" not in columns:
+        cur.execute(
+            "ALTER TABLE measurements ADD COLUMN subcategory_id INTEGER REFERENCES subcategories (id)"
+        )
+    cur.execute("PRAGMA table_info(measurement_fields)")
+    if "active" not in [row[1] for row in cur.fetchall()]:
+        # Fields removed on the categories page are kept, inactive, while
+        # stored values still point at them.
+        cur.execute("ALTER TABLE measurement_fields ADD COLUMN active INTEGER NOT NULL DEFAULT 1")
+    cur.execute(
         """
-        SELECT orders.id, orders.status, orders.due_date, customers.name, SUM(order_items.qty) as total_qty
-        FROM orders
-        JOIN customers ON customers.id = orders.customer_id
-        JOIN order_items ON order_items.order_id = orders.id
-        WHERE order_items.item_type = 'Shirt' AND orders.status != 'Completed'
-        GROUP BY orders.id
-        ORDER BY orders.due_date IS NULL, orders.due_date ASC
-        LIMIT 6
+        CREATE TABLE IF NOT EXISTS measurement_values (
+            measurement_id INTEGER NOT NULL REFERENCES measurements (id),
+            field_id INTEGER NOT NULL REFERENCES measurement_fields (id),
+            value REAL NOT NULL,
+            PRIMARY KEY (measurement_id, field_id)
+        ) WITHOUT ROWID
         """
-    ).fetchall()
-
-    pant_queue = conn.execute(
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_measurement_values_field ON measurement_values (field_id)"
+    )
+    cur.execute(
         """
-        SELECT orders.id, orders.status, orders.due_date, customers.name, SUM(order_items.qty) as total_qty
-        FROM orders
-        JOIN customers ON customers.id = orders.customer_id
-        JOIN order_items ON order_items.order_id = orders.id
-        WHERE order_items.item_type = 'Pant' AND orders.status != 'Completed'
-        GROUP BY orders.id
-        ORDER BY orders.due_date IS NULL, orders.due_date ASC
-        LIMIT 6
+        CREATE INDEX IF NOT EXISTS idx_measurements_customer_subcategory
+        ON measurements (customer_id, subcategory_id, id)
         """
+    )
+
+    legacy = [column for column in LEGACY_MEASURE_COLUMNS if column in columns]
+    if not legacy:
+        return
+    subcategories: dict[str, int] = {}
+    field_ids: dict[tuple[int, str], int] = {}
+    rows = cur.execute(
+        f"SELECT id, kind, notes, {', '.join(legacy)} FROM measurements"
     ).fetchall()
+    for row in rows:
+        kind = row["kind"]
+        if kind not in subcategories:
+            subcategories[kind] = legacy_measure_subcategory(conn, kind)
+        subcategory_id = subcategories[kind]
+        values = []
+        unreadable = []
+        for column in legacy:
+            raw = row[column]
+            if raw is None or raw == "":
+                continue
+            try:
+                value = parse_measure(raw)
+            except ValueError:
+                unreadable.append(f"{column.title()}: {raw}")
+                continue
+            key = (subcategory_id, column)
+            if key not in field_ids:
+                conn.execute(
+                    """
+                    INSERT OR IGNORE INTO measurement_fields
+                        (subcategory_id, field_key, field_label, sort_order)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    (subcategory_id, column, column.title(), LEGACY_MEASURE_COLUMNS.index(column)),
+                )
+                field_ids[key] = conn.execute(
+                    "SELECT id FROM measurement_fields WHERE subcategory_id = ? AND field_key = ?",
+                    key,
+                ).fetchone()[0]
+            values.append((row["id"], field_ids[key], value))
+        conn.executemany(
+            "INSERT INTO measurement_values (measurement_id, field_id, value) VALUES (?, ?, ?)",
+            values,
+        )
+        notes = "\n".join(filter(None, [row["notes"], *unreadable])) or None
+        conn.execute(
+            "UPDATE measurements SET subcategory_id = ?, notes = ? WHERE id = ?",
+            (subcategory_id, notes, row["id"]),
+        )
+    for column in legacy:
+        cur.execute(f"ALTER TABLE measurements DROP COLUMN {column}")
 
-    tailors = conn.execute("SELECT * FROM tailors ORDER BY team, name").fetchall()
 
-    revenue = conn.execute(
-        "SELECT COALESCE(SUM(total_amount), 0) AS revenue FROM orders WHERE paid_at IS NOT NULL"
-    ).fetchone()
-    spent = conn.execute(
-        "SELECT COALESCE(SUM(total_price), 0) AS spent FROM vendor_purchases"
-    ).fetchone()
+# Open orders (anything not Completed) and their pieces per assigned tailor.
+# orders.assigned_tailor stays as the tailor's display name; the id is what
+# counts, and renaming a tailor rewrites the name on their orders.
+TAILOR_WORKLOAD_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS tailor_workload_orders_insert AFTER INSERT ON orders
+    WHEN NEW.assigned_tailor_id IS NOT NULL AND NEW.status != 'Completed'
+    BEGIN
+        INSERT INTO tailor_workload (tailor_id, open_orders, open_pieces)
+        VALUES (
+            NEW.assigned_tailor_id, 1,
+            (SELECT COALESCE(SUM(qty), 0) FROM order_items WHERE order_id = NEW.id)
+        )
+        ON CONFLICT (tailor_id) DO UPDATE
+        SET open_orders = open_orders + 1, open_pieces = open_pieces + excluded.open_pieces;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tailor_workload_orders_delete AFTER DELETE ON orders
+    WHEN OLD.assigned_tailor_id IS NOT NULL AND OLD.status != 'Completed'
+    BEGIN
+        UPDATE tailor_workload
+        SET open_orders = open_orders - 1,
+            open_pieces = open_pieces
+                - (SELECT COALESCE(SUM(qty), 0) FROM order_items WHERE order_id = OLD.id)
+        WHERE tailor_id = OLD.assigned_tailor_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tailor_workload_orders_update
+    AFTER UPDATE OF assigned_tailor_id, status ON orders
+    WHEN OLD.assigned_tailor_id IS NOT NEW.assigned_tailor_id
+        OR (OLD.status = 'Completed') != (NEW.status = 'Completed')
+    BEGIN
+        UPDATE tailor_workload
+        SET open_orders = open_orders - 1,
+            open_pieces = open_pieces
+                - (SELECT COALESCE(SUM(qty), 0) FROM order_items WHERE order_id = OLD.id)
+        WHERE tailor_id = OLD.assigned_tailor_id AND OLD.status != 'Completed';
+        INSERT INTO tailor_workload (tailor_id, open_orders, open_pieces)
+        SELECT NEW.assigned_tailor_id, 1,
+               (SELECT COALESCE(SUM(qty), 0) FROM order_items WHERE order_id = NEW.id)
+        WHERE NEW.assigned_tailor_id IS NOT NULL AND NEW.status != 'Completed'
+        ON CONFLICT (tailor_id) DO UPDATE
+        SET open_orders = open_orders + 1, open_pieces = open_pieces + excluded.open_pieces;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tailor_workload_order_items_insert AFTER INSERT ON order_items
+    BEGIN
+        UPDATE tailor_workload SET open_pieces = open_pieces + NEW.qty
+        WHERE tailor_id = (
+            SELECT assigned_tailor_id FROM orders
+            WHERE id = NEW.order_id AND status != 'Completed'
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tailor_workload_order_items_delete AFTER DELETE ON order_items
+    BEGIN
+        UPDATE tailor_workload SET open_pieces = open_pieces - OLD.qty
+        WHERE tailor_id = (
+            SELECT assigned_tailor_id FROM orders
+            WHERE id = OLD.order_id AND status != 'Completed'
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tailor_workload_order_items_update
+    AFTER UPDATE OF qty, order_id ON order_items
+    BEGIN
+        UPDATE tailor_workload SET open_pieces = open_pieces - OLD.qty
+        WHERE tailor_id = (
+            SELECT assigned_tailor_id FROM orders
+            WHERE id = OLD.order_id AND status != 'Completed'
+        );
+        UPDATE tailor_workload SET open_pieces = open_pieces + NEW.qty
+        WHERE tailor_id = (
+            SELECT assigned_tailor_id FROM orders
+            WHERE id = NEW.order_id AND status != 'Completed'
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tailor_workload_rename AFTER UPDATE OF name ON tailors
+    WHEN NEW.name IS NOT OLD.name
+    BEGIN
+        UPDATE orders SET assigned_tailor = NEW.name WHERE assigned_tailor_id = NEW.id;
+    END
+    """,
+]
+
+
+def compute_tailor_workload(conn: sqlite3.Connection) -> dict[int, tuple[int, int]]:
+    return {
+        row[0]: (row[1], row[2])
+        for row in conn.execute(
+            """
+            SELECT o.assigned_tailor_id, COUNT(*),
+                   COALESCE(SUM((SELECT SUM(qty) FROM order_items i WHERE i.order_id = o.id)), 0)
+            FROM orders o
+            WHERE o.assigned_tailor_id IS NOT NULL AND o.status != 'Completed'
+            GROUP BY o.assigned_tailor_id
+            """
+        )
+    }
 
-    conn.close()
-    return render_template(
-        "dashboard.html",
-        counts=counts,
-        total_orders=int(totals["total_orders"]),
-        total_items=int(total_items["total_items"]),
-        stock_units=int(stock_units["stock_units"]),
-        low_stock_count=int(low_stock_count["low_stock"]),
-        recent_orders=recent_orders,
-        low_stock=low_stock,
-        shirt_queue=shirt_queue,
-        pant_queue=pant_queue,
-        tailors=tailors,
-        active_orders=active_orders,
-        pickup_results=pickup_results,
-        q=q,
-        revenue=float(revenue["revenue"]),
-        spent=float(spent["spent"]),
+
+def rebuild_tailor_workload(conn: sqlite3.Connection) -> dict[str, tuple[float, float]]:
+    """Recount tailor_workload; returns drift keyed like rebuild_stats."""
+    fresh = compute_tailor_workload(conn)
+    stored = {
+        row[0]: (row[1], row[2])
+        for row in conn.execute("SELECT tailor_id, open_orders, open_pieces FROM tailor_workload")
+    }
+    drift = {}
+    for tailor_id in sorted(stored.keys() | fresh.keys()):
+        old, new = stored.get(tailor_id, (0, 0)), fresh.get(tailor_id, (0, 0))
+        for column, before, after in zip(("open_orders", "open_pieces"), old, new):
+            if before != after:
+                drift[f"tailor_workload:{tailor_id}:{column}"] = (before, after)
+    conn.execute("DELETE FROM tailor_workload")
+    conn.executemany(
+        "INSERT INTO tailor_workload (tailor_id, open_orders, open_pieces) VALUES (?, ?, ?)",
+        [(tailor_id, *counts) for tailor_id, counts in fresh.items()],
     )
+    return drift
+
+
+def migration_0011_tailor_workload(conn: sqlite3.Connection) -> None:
+    cur = conn.cursor()
+    cur.execute("PRAGMA table_info(orders)")
+    if "assigned_tailor_id" not in [row[1] for row in cur.fetchall()]:
+        cur.execute(
+            "ALTER TABLE orders ADD COLUMN assigned_tailor_id INTEGER REFERENCES tailors (id)"
+        )
+    # Names were never unique; the oldest tailor of a name is the one
+    # create_order already picked the team from.
+    cur.execute(
+        """
+        UPDATE orders
+        SET assigned_tailor_id = (
+            SELECT t.id FROM tailors t WHERE t.name = orders.assigned_tailor ORDER BY t.id LIMIT 1
+        )
+        WHERE assigned_tailor IS NOT NULL AND assigned_tailor_id IS NULL
+        """
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_orders_assigned_tailor ON orders (assigned_tailor_id)"
+    )
+    # Next due date per tailor is a single seek into this one.
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_orders_tailor_open_due
+        ON orders (assigned_tailor_id, due_date) WHERE status != 'Completed'
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tailor_workload (
+            tailor_id INTEGER PRIMARY KEY REFERENCES tailors (id),
+            open_orders INTEGER NOT NULL DEFAULT 0,
+            open_pieces INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    for statement in TAILOR_WORKLOAD_TRIGGERS:
+        cur.execute(statement)
+    rebuild_tailor_workload(conn)
+
+
+def migration_0012_drop_eager_receipts(conn: sqlite3.Connection) -> None:
+    # Receipts used to be written once, as EXP-0001.pdf, when the expense was
+    # saved, and were served from static/ as-is even after an edit. They are
+    # rendered on demand under a content-hashed name now.
+    eager = re.compile(r"^EXP-\d+\.pdf$")
+    try:
+        names = os.listdir(receipt_cache_dir())
+    except FileNotFoundError:
+        return
+    for name in names:
+        if eager.match(name):
+            try:
+                os.remove(os.path.join(receipt_cache_dir(), name))
+            except OSError:
+                pass
+
+
+# Applied in order by `flask --app app migrate`; the schema version is kept in
+# PRAGMA user_version. Never edit a shipped migration, append a new one.
+MIGRATIONS = [
+    (1, "base schema and seed data", migration_0001_base_schema),
+    (2, "secondary indexes for hot queries", migration_0002_query_indexes),
+    (3, "trigger-maintained stats counters", migration_0003_stats_counters),
+    (4, "full-text search index", migration_0004_search_index),
+    (5, "normalized customer phone numbers", migration_0005_phone_digits),
+    (6, "background render job queue", migration_0006_render_jobs),
+    (7, "document number sequences", migration_0007_sequences),
+    (8, "order image thumbnails", migration_0008_image_derivatives),
+    (9, "content-addressed uploads", migration_0009_upload_blobs),
+    (10, "measurement values keyed by field", migration_0010_measurement_values),
+    (11, "orders assigned by tailor id with workload counters", migration_0011_tailor_workload),
+    (12, "remove eagerly rendered receipt PDFs", migration_0012_drop_eager_receipts),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def init_db(conn: sqlite3.Connection | None = None) -> list[int]:
+    conn = conn or get_db()
+    applied = []
+    for version, _name, migrate in MIGRATIONS:
+        # IMMEDIATE takes the write lock up front, so two deploys racing each
+        # other apply every migration exactly once.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            migrate(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+@app.cli.command("migrate")
+def migrate_command() -> None:
+    applied = init_db()
+    for version, name, _migrate in MIGRATIONS:
+        if version in applied:
+            click.echo(f"Applied migration {version:04d}: {name}")
+    click.echo(f"Database schema is at version {schema_version(get_db())}.")
+
+
+@app.cli.command("rebuild-stats")
+@click.option("--check", is_flag=True, help="Only report drift; exit non-zero if any.")
+def rebuild_stats_command(check: bool) -> None:
+    conn = get_db()
+    conn.execute("BEGIN IMMEDIATE")
+    drift = rebuild_stats(conn) | rebuild_tailor_workload(conn)
+    if check:
+        conn.rollback()
+    else:
+        conn.commit()
+        dashboard_cache.clear()
+    for key, (stored, fresh) in drift.items():
+        click.echo(f"drift {key}: stored {stored:g}, actual {fresh:g}")
+    if not drift:
+        click.echo("Stats match the tables.")
+    elif check:
+        raise click.ClickException(f"{len(drift)} counters have drifted.")
+    else:
+        click.echo(f"Rebuilt {len(drift)} drifted counters.")
+
+
+# (name, sql, params) for the SQL each hot view runs, checked by
+# `flask --app app check-query-plans` and tests/test_query_plans.py. Entries
+# are appended next to the constant the view executes, so the two cannot drift.
+QUERY_PLAN_CHECKS: list[tuple[str, str, tuple]] = []
+
+
+def seed_benchmark_db(conn: sqlite3.Connection, order_count: int) -> None:
+    customer_count = max(order_count // 4, 1)
+    vendor_count = max(order_count // 200, 1)
+    expense_count = max(order_count // 2, 1)
+    # Like a real shop, most of the history is completed orders.
+    open_statuses = ["Pending", "In progress", "Ready"]
+    cur = conn.cursor()
+    cur.executemany(
+        "INSERT INTO customers (name, phone, notes, created_at) VALUES (?, ?, ?, ?)",
+        (
+            (f"Customer {i}", f"9{i:09d}", None, f"2024-01-01 {i % 24:02d}:00")
+            for i in range(customer_count)
+        ),
+    )
+    backfill_phone_digits(conn)
+    first_customer = cur.execute("SELECT MIN(id) FROM customers WHERE phone LIKE '9%'").fetchone()[0]
+    tailor_ids = [row[0] for row in cur.execute("SELECT id FROM tailors ORDER BY id")] or [None]
+    cur.executemany(
+        """
+        INSERT INTO orders (customer_id, due_date, status, priority, created_at, assigned_tailor_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (
+            (
+                first_customer + i % customer_count,
+                f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+                open_statuses[i % 3] if i % 10 == 0 else "Completed",
+                "Normal",
+                f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d} {i % 24:02d}:{i % 60:02d}",
+                tailor_ids[i % len(tailor_ids)],
+            )
+            for i in range(order_count)
+        ),
+    )
+    cur.execute(
+        """
+        INSERT INTO order_items (order_id, item_type, qty, notes)
+        SELECT id, CASE id % 2 WHEN 0 THEN 'Shirt' ELSE 'Pant' END, 1 + id % 3, NULL
+        FROM orders
+        """
+    )
+    cur.execute(
+        "INSERT INTO order_images (order_id, filename, label) SELECT id, 'x.jpg', NULL FROM orders WHERE id % 3 = 0"
+    )
+    cur.execute(
+        """
+        INSERT INTO measurements (customer_id, kind, subcategory_id, created_at)
+        SELECT c.id, 'Shirt - Full Hand', s.id, c.created_at
+        FROM customers c, subcategories s
+        WHERE s.name = 'Full Hand'
+        """
+    )
+    cur.execute(
+        """
+        INSERT OR IGNORE INTO measurement_fields (subcategory_id, field_key, field_label, sort_order)
+        SELECT id, 'chest', 'Chest', 1 FROM subcategories WHERE name = 'Full Hand'
+        """
+    )
+    cur.execute(
+        """
+        INSERT INTO measurement_values (measurement_id, field_id, value)
+        SELECT m.id, f.id, 40
+        FROM measurements m
+        JOIN measurement_fields f ON f.subcategory_id = m.subcategory_id AND f.field_key = 'chest'
+        WHERE m.kind = 'Shirt - Full Hand'
+        """
+    )
+    cur.executemany(
+        "INSERT INTO inventory (inventory_code, name, qty, updated_at) VALUES (?, ?, ?, ?)",
+        ((f"BEN-{i:06d}", f"Item {i}", i % 50, "2025-01-01 00:00") for i in range(order_count // 10)),
+    )
+    cur.executemany(
+        "INSERT INTO vendors (vendor_code, name, created_at) VALUES (?, ?, ?)",
+        ((f"BEN{i:06d}", f"Vendor {i}", f"2024-01-{i % 28 + 1:02d} 10:00") for i in range(vendor_count)),
+    )
+    first_vendor = cur.execute("SELECT MIN(id) FROM vendors WHERE vendor_code LIKE 'BEN%'").fetchone()[0]
+    cur.executemany(
+        """
+        INSERT INTO vendor_purchases (vendor_id, material_name, qty, unit_price, total_price, purchased_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (
+            (first_vendor + i % vendor_count, f"Material {i}", 2, 5, 10, f"2025-01-{i % 28 + 1:02d} 10:00")
+            for i in range(order_count)
+        ),
+    )
+    cur.executemany(
+        "INSERT INTO expenses (expense_no, expense_name, amount, created_at) VALUES (?, ?, ?, ?)",
+        ((f"BEN-{i:07d}", f"Expense {i}", 10, f"2025-02-{i % 28 + 1:02d} 09:00") for i in range(expense_count)),
+    )
+    cur.execute(
+        """
+        INSERT INTO salaries (expense_id, staff_no, shift_no, salary_amount, created_at)
+        SELECT id, 'TLR001', '-', amount, created_at FROM expenses WHERE id % 5 = 0
+        """
+    )
+    cur.execute("ANALYZE")
+    conn.commit()
+
+
+def full_scans(conn: sqlite3.Connection, sql: str, params: tuple) -> list[str]:
+    # "SCAN t USING [COVERING] INDEX" walks an index in order and is fine;
+    # a bare "SCAN t" reads every row of the table.
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return [
+        row["detail"]
+        for row in plan
+        if row["detail"].startswith("SCAN ") and " USING " not in row["detail"]
+    ]
+
+
+@app.cli.command("check-query-plans")
+@click.option("--orders", "order_count", default=20000, show_default=True,
+              help="Orders to seed into the scratch database.")
+def check_query_plans_command(order_count: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "plans.db"))
+        conn.row_factory = sqlite3.Row
+        try:
+            init_db(conn)
+            seed_benchmark_db(conn, order_count)
+            failures = 0
+            for name, sql, params in QUERY_PLAN_CHECKS:
+                scans = full_scans(conn, sql, params)
+                if scans:
+                    failures += 1
+                    click.echo(f"FAIL {name}: {'; '.join(scans)}")
+                else:
+                    click.echo(f"ok   {name}")
+        finally:
+            conn.close()
+    if failures:
+        raise click.ClickException(f"{failures} queries fall back to a full table scan.")
+
+
+@app.before_request
+def ensure_db_ready() -> None:
+    global _db_ready
+    if not _db_ready:
+        version = schema_version(get_db())
+        if version < SCHEMA_VERSION:
+            raise RuntimeError(
+                f"Database schema is at version {version}, expected {SCHEMA_VERSION}. "
+                "Run `flask --app app migrate` before starting the app."
+            )
+        _db_ready = True
+        render_queue.start()
+
+
+def now_str() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M")
+
+
+PHONE_COUNTRY_CODE = os.environ.get("TAILOR_PHONE_COUNTRY_CODE", "91")
+
+
+def normalize_phone(phone: str) -> str:
+    # "555-0101", "5550101" and "+91 555 0101" all become "5550101": digits
+    # only, with the home country code dropped from international numbers.
+    phone = phone.strip()
+    digits = "".join(ch for ch in phone if ch.isdigit())
+    if phone.startswith("+") or digits.startswith("00"):
+        digits = digits.lstrip("0")
+        if PHONE_COUNTRY_CODE and digits.startswith(PHONE_COUNTRY_CODE):
+            digits = digits[len(PHONE_COUNTRY_CODE):]
+    return digits
+
+
+def phone_query(text: str) -> str | None:
+    # Counter staff type phone fragments with spaces and dashes; anything
+    # else (letters) is a name search.
+    if any(ch.isalpha() for ch in text):
+        return None
+    digits = normalize_phone(text)
+    return digits if len(digits) >= 3 else None
+
+
+def phone_prefix_range(digits: str) -> tuple[str, str]:
+    # phone_digits >= lo AND phone_digits < hi is an index range scan;
+    # ":" sorts right after "9".
+    return digits, digits + ":"
+
+
+def customer_search_clause(text: str, column: str = "id") -> tuple[str, list[str]]:
+    digits = phone_query(text)
+    if digits:
+        return (
+            f"{column} IN (SELECT id FROM customers WHERE phone_digits >= ? AND phone_digits < ?)",
+            list(phone_prefix_range(digits)),
+        )
+    return (
+        f"""
+        {column} IN (
+            SELECT rowid / 4 FROM search_index
+            WHERE search_index MATCH ? AND rowid % 4 = 1
+        )
+        """,
+        [fts_query(text) or '""'],
+    )
+
+
+def next_sequence(conn: sqlite3.Connection, name: str, count: int = 1) -> int:
+    """Reserve ``count`` consecutive numbers from sequence ``name``; returns the first.
+
+    Runs in the caller's transaction. The sequence row stays write-locked
+    until that commits, and a rollback hands the numbers back, so numbers
+    never collide and never skip. Unknown names start at 1.
+    """
+    (last,) = conn.execute(
+        """
+        INSERT INTO sequences (name, value) VALUES (?, ?)
+        ON CONFLICT (name) DO UPDATE SET value = value + excluded.value
+        RETURNING value
+        """,
+        (name, count),
+    ).fetchone()
+    return last - count + 1
+
+
+def peek_sequence(conn: sqlite3.Connection, name: str) -> int:
+    """The number next_sequence() would hand out now, for display only."""
+    row = conn.execute("SELECT value FROM sequences WHERE name = ?", (name,)).fetchone()
+    return (row[0] if row else 0) + 1
+
+
+def generate_expense_no(conn: sqlite3.Connection, preview: bool = False) -> str:
+    number = peek_sequence(conn, "expense_no") if preview else next_sequence(conn, "expense_no")
+    return f"EXP-{number:04d}"
+
+# A printed line: (text, bold).
+ThermalLine = tuple[str, bool]
+THERMAL_RULE: ThermalLine = ("-" * 32, False)
+
+
+class ThermalDocument:
+    """An 80mm thermal-paper PDF, written one page per ticket or receipt.
+
+    Each page is sized to its content, long lines are wrapped to the paper
+    width, and the font is only switched when a line's weight changes.
+    Add as many pages as needed, then save().
+    """
+
+    font = "Helvetica"
+    bold_font = "Helvetica-Bold"
+    font_size = 9
+    margin = 5 * mm
+    line_height = 5 * mm
+    top = 10 * mm
+    bottom = 10 * mm
+    min_height = 50 * mm
+
+    def __init__(self, target) -> None:
+        # target is a path or a binary file object.
+        self.canvas = canvas.Canvas(target, pagesize=(THERMAL_WIDTH, self.min_height))
+        self.text_width = THERMAL_WIDTH - 2 * self.margin
+        self.pages = 0
+
+    def layout(self, lines: Iterable[ThermalLine]) -> list[ThermalLine]:
+        laid_out = []
+        for text, bold in lines:
+            font = self.bold_font if bold else self.font
+            if stringWidth(text, font, self.font_size) <= self.text_width:
+                # Padding spaces line up the label columns; leave fitting lines alone.
+                laid_out.append((text, bold))
+                continue
+            body = text.lstrip()
+            indent = text[: len(text) - len(body)]
+            width = self.text_width - stringWidth(indent, font, self.font_size)
+            for part in simpleSplit(body, font, self.font_size, width):
+                laid_out.append((indent + part, bold))
+        return laid_out
+
+    def add_page(self, lines: Iterable[ThermalLine]) -> None:
+        laid_out = self.layout(lines)
+        height = max(
+            self.min_height,
+            self.top + max(len(laid_out) - 1, 0) * self.line_height + self.bottom,
+        )
+        pdf = self.canvas
+        pdf.setPageSize((THERMAL_WIDTH, height))
+        y = height - self.top
+        current_font = None
+        for text, bold in laid_out:
+            font = self.bold_font if bold else self.font
+            if font != current_font:
+                pdf.setFont(font, self.font_size)
+                current_font = font
+            pdf.drawString(self.margin, y, text)
+            y -= self.line_height
+        pdf.showPage()
+        self.pages += 1
+
+    def save(self) -> None:
+        self.canvas.save()
+
+
+def expense_receipt_lines(
+    expense_no: str,
+    name: str,
+    amount: float,
+    created_at: str,
+    is_salary: bool = False,
+    staff_no: str | None = None,
+) -> list[ThermalLine]:
+    lines = [
+        ("PREMIER TAILORS", True),
+        ("Salary Receipt" if is_salary else "Expense Receipt", True),
+        THERMAL_RULE,
+        (f"Receipt No : {expense_no}", False),
+        (f"Date       : {created_at}", False),
+    ]
+    if is_salary and staff_no:
+        lines.append((f"Staff No   : {staff_no}", False))
+    lines.append(THERMAL_RULE)
+    if is_salary:
+        lines += [
+            ("Salary Paid To:", False),
+            (name, False),
+            (f"Salary Amount : Rs. {amount}", True),
+        ]
+    else:
+        lines += [
+            ("Expense:", False),
+            (name, False),
+            (f"Amount : Rs. {amount}", True),
+        ]
+    lines += [THERMAL_RULE, ("Thank you", True), ("System Generated", False)]
+    return lines
+
+
+def generate_expense_pdf_80mm(
+    expense_no: str,
+    name: str,
+    amount: float,
+    created_at: str,
+    is_salary: bool = False,
+    staff_no: str | None = None,
+    file_path: str | None = None,
+):
+    folder = os.path.join(APP_DIR, "static", "expense_pdfs")
+    os.makedirs(folder, exist_ok=True)
+
+    file_path = file_path or os.path.join(folder, f"{expense_no}.pdf")
+
+    doc = ThermalDocument(file_path)
+    doc.add_page(
+        expense_receipt_lines(expense_no, name, amount, created_at, is_salary, staff_no)
+    )
+    doc.save()
+
+
+# Bump when the receipt layout changes so every cached PDF is re-rendered.
+RECEIPT_LAYOUT_VERSION = 2
+
+
+def load_receipt(conn: sqlite3.Connection, expense_id: int) -> tuple[sqlite3.Row, str] | None:
+    """The expense/salary row a receipt is printed from, plus its content hash."""
+    row = conn.execute(
+        """
+        SELECT e.id, e.expense_no, e.expense_name, e.amount, e.created_at,
+               s.staff_no, s.shift_no, s.salary_amount
+        FROM expenses e
+        LEFT JOIN salaries s ON s.expense_id = e.id
+        WHERE e.id = ?
+        ORDER BY s.id
+        LIMIT 1
+        """,
+        (expense_id,),
+    ).fetchone()
+    if row is None:
+        return None
+    payload = json.dumps([RECEIPT_LAYOUT_VERSION, *row], default=str)
+    return row, hashlib.sha256(payload.encode()).hexdigest()
+
+
+def receipt_cache_dir() -> str:
+    return os.path.join(APP_DIR, "static", "expense_pdfs")
+
+
+def drop_cached_receipts(expense_no: str, keep: str | None = None) -> None:
+    folder = receipt_cache_dir()
+    try:
+        names = os.listdir(folder)
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(folder, name)
+        if name.startswith(f"{expense_no}-") and name.endswith(".pdf") and path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def receipt_file(row: sqlite3.Row, digest: str) -> str:
+    """Path of the cached receipt PDF for this row version, rendering it if missing.
+
+    Files are named by content hash, so an edited expense simply misses the
+    cache; the superseded versions are removed once the new one is written.
+    """
+    path = os.path.join(receipt_cache_dir(), f"{row['expense_no']}-{digest[:16]}.pdf")
+    if os.path.exists(path):
+        return path
+    os.makedirs(receipt_cache_dir(), exist_ok=True)
+    # Render to a private name and rename, so a concurrent request never
+    # serves a half-written file.
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        generate_expense_pdf_80mm(
+            row["expense_no"],
+            row["expense_name"],
+            row["amount"],
+            row["created_at"],
+            is_salary=row["staff_no"] is not None,
+            staff_no=row["staff_no"],
+            file_path=tmp_path,
+        )
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    drop_cached_receipts(row["expense_no"], keep=path)
+    return path
+
+
+def render_expense_receipt(conn: sqlite3.Connection, expense_id: int) -> str:
+    receipt = load_receipt(conn, expense_id)
+    if receipt is None:
+        raise LookupError(f"expense {expense_id} no longer exists")
+    path = receipt_file(*receipt)
+    return os.path.relpath(path, os.path.join(APP_DIR, "static")).replace(os.sep, "/")
+
+
+# Uploads are stored once under the SHA-256 of their content; the rows in
+# order_images that share a file are counted in upload_blobs.refcount.
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Unreferenced files younger than this may belong to an order still being saved.
+UPLOAD_GC_GRACE = 3600
+# Names the upload code writes: content-addressed blobs, the uuid-prefixed
+# names used before them, and partial writes. Anything else is left alone.
+UPLOAD_NAME_RE = re.compile(r"^(?:[0-9a-f]{64}(?:\.\w+)?|[0-9a-f]{32}_.+|\.incoming-[0-9a-f]{32})$")
+
+
+def upload_extension(original_name: str) -> str:
+    ext = os.path.splitext(secure_filename(original_name))[1].lower()
+    return ".jpg" if ext == ".jpeg" else ext
+
+
+def upload_too_large(limit: int) -> RequestEntityTooLarge:
+    return RequestEntityTooLarge(f"Each file must be at most {limit // (1024 * 1024)} MB.")
+
+
+class UploadSpool:
+    """Destination for one multipart file part, written straight into UPLOAD_FOLDER.
+
+    Werkzeug's form parser feeds it the part in 64 KiB chunks; each chunk is
+    hashed and written through, so a photo is never buffered in memory and
+    never read back to be named. Unless persist() moves it to its
+    content-addressed name, the partial file is deleted on close().
+    """
+
+    def __init__(self, folder: str, limit: int | None = None):
+        self.path: str | None = os.path.join(folder, f".incoming-{uuid.uuid4().hex}")
+        self.file = open(self.path, "w+b")
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.limit = limit
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.limit is not None and self.size > self.limit:
+            # Raised mid-parse, so the rest of the body is never read.
+            raise upload_too_large(self.limit)
+        self.digest.update(data)
+        return self.file.write(data)
+
+    def __getattr__(self, name: str):
+        return getattr(self.file, name)
+
+    def persist(self, filename: str) -> None:
+        self.file.close()
+        path = os.path.join(os.path.dirname(self.path), filename)
+        try:
+            # Touching the existing blob keeps gc-uploads off it until the
+            # order referencing it is committed.
+            os.utime(path)
+        except FileNotFoundError:
+            os.replace(self.path, path)
+        else:
+            os.remove(self.path)
+        self.path = None
+
+    def close(self) -> None:
+        self.file.close()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+
+class UploadRequest(Request):
+    """Request whose multipart files are spooled by UploadSpool."""
+
+    @cached_property
+    def upload_spools(self) -> list[UploadSpool]:
+        return []
+
+    def _get_file_stream(
+        self,
+        total_content_length: int | None,
+        content_type: str | None,
+        filename: str | None = None,
+        content_length: int | None = None,
+    ) -> UploadSpool:
+        limit = app.config["MAX_UPLOAD_FILE_SIZE"]
+        # Browsers rarely send a per-part length, but when one is there the
+        # file is refused before any of it is read.
+        if limit is not None and content_length and content_length > limit:
+            raise upload_too_large(limit)
+        spool = UploadSpool(app.config["UPLOAD_FOLDER"], limit)
+        self.upload_spools.append(spool)
+        return spool
+
+    def close(self) -> None:
+        super().close()
+        # Also covers parts whose parse was cut short by a limit.
+        for spool in self.upload_spools:
+            spool.close()
+
+
+app.request_class = UploadRequest
+
+
+def store_upload(stream, original_name: str) -> str:
+    """Give an upload its content-addressed name in UPLOAD_FOLDER and return it."""
+    if isinstance(stream, UploadSpool):
+        spool = stream
+    else:
+        spool = UploadSpool(app.config["UPLOAD_FOLDER"])
+        try:
+            shutil.copyfileobj(stream, spool, UPLOAD_CHUNK_SIZE)
+        except BaseException:
+            spool.close()
+            raise
+    filename = spool.digest.hexdigest() + upload_extension(original_name)
+    spool.persist(filename)
+    return filename
+
+
+def collect_upload_garbage(
+    conn: sqlite3.Connection,
+    grace: float = UPLOAD_GC_GRACE,
+    dry_run: bool = False,
+) -> tuple[int, int]:
+    """Delete uploads and derivatives no order_images row refers to.
+
+    Returns (files, bytes) removed, or that would be removed with dry_run.
+    """
+    folder = app.config["UPLOAD_FOLDER"]
+    cutoff = time.time() - grace
+    live = {row[0] for row in conn.execute("SELECT filename FROM upload_blobs WHERE refcount > 0")}
+    live_derived = {
+        os.path.basename(image_derivative(filename, kind))
+        for filename in live
+        for kind in IMAGE_DERIVATIVES
+    }
+    garbage = []
+    for entry in os.scandir(folder):
+        if (
+            entry.is_file()
+            and UPLOAD_NAME_RE.match(entry.name)
+            and entry.name not in live
+            and entry.stat().st_mtime < cutoff
+        ):
+            garbage.append(entry)
+    derived_dir = os.path.join(folder, "derived")
+    if os.path.isdir(derived_dir):
+        for entry in os.scandir(derived_dir):
+            if (
+                entry.is_file()
+                and entry.name not in live_derived
+                and entry.stat().st_mtime < cutoff
+            ):
+                garbage.append(entry)
+    freed = sum(entry.stat().st_size for entry in garbage)
+    if not dry_run:
+        for entry in garbage:
+            os.remove(entry.path)
+        conn.execute("DELETE FROM upload_blobs WHERE refcount <= 0")
+        conn.commit()
+    return len(garbage), freed
+
+
+# Downscaled copies of order photos: name -> longest edge in pixels.
+IMAGE_DERIVATIVES = {"thumb": 256, "preview": 1024}
+DERIVATIVE_FORMAT = "WEBP" if features.check("webp") else "JPEG"
+DERIVATIVE_EXT = "webp" if DERIVATIVE_FORMAT == "WEBP" else "jpg"
+
+
+def image_derivative(filename: str, kind: str) -> str:
+    """Path under static/ of one derivative of an uploaded image."""
+    stem = os.path.splitext(filename)[0]
+    return f"uploads/derived/{stem}.{IMAGE_DERIVATIVES[kind]}.{DERIVATIVE_EXT}"
+
+
+def write_image_derivatives(source: str, paths: dict[str, str]) -> None:
+    with Image.open(source) as original:
+        largest = max(IMAGE_DERIVATIVES.values())
+        # draft() lets the JPEG decoder skip straight to a reduced scale,
+        # which is most of the cost for 12-megapixel phone photos.
+        original.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGBA" if DERIVATIVE_FORMAT == "WEBP" else "RGB")
+        # Largest first, each smaller one scaled down from the last.
+        for kind, size in sorted(IMAGE_DERIVATIVES.items(), key=lambda item: -item[1]):
+            image.thumbnail((size, size))
+            tmp_path = f"{paths[kind]}.{uuid.uuid4().hex}.tmp"
+            image.save(tmp_path, DERIVATIVE_FORMAT, quality=80)
+            os.replace(tmp_path, paths[kind])
+
+
+def render_image_derivatives(conn: sqlite3.Connection, image_id: int) -> str:
+    row = conn.execute("SELECT filename FROM order_images WHERE id = ?", (image_id,)).fetchone()
+    if row is None:
+        raise LookupError(f"order image {image_id} no longer exists")
+    source = os.path.join(app.config["UPLOAD_FOLDER"], row["filename"])
+    if not os.path.exists(source):
+        raise LookupError(f"upload {row['filename']} is missing")
+    derived_dir = os.path.join(app.config["UPLOAD_FOLDER"], "derived")
+    os.makedirs(derived_dir, exist_ok=True)
+    paths = {
+        kind: os.path.join(derived_dir, os.path.basename(image_derivative(row["filename"], kind)))
+        for kind in IMAGE_DERIVATIVES
+    }
+    # Uploads shared by several orders are rendered once.
+    if not all(os.path.exists(path) for path in paths.values()):
+        write_image_derivatives(source, paths)
+    conn.execute("UPDATE order_images SET derived_at = ? WHERE id = ?", (now_str(), image_id))
+    return image_derivative(row["filename"], "thumb")
+
+
+# Render job kinds; each renderer returns the output path under static/.
+RENDERERS = {
+    "expense_receipt": render_expense_receipt,
+    "image_derivatives": render_image_derivatives,
+}
+
+
+# Oldest due job, or a running one whose lease has expired.
+RENDER_CLAIM_SQL = """
+    UPDATE render_jobs
+    SET status = 'running', attempts = attempts + 1,
+        run_after = ?, updated_at = ?
+    WHERE id = (
+        SELECT id FROM render_jobs
+        WHERE status IN ('queued', 'running') AND run_after <= ?
+        ORDER BY run_after
+        LIMIT 1
+    )
+    RETURNING id, kind, ref_id, attempts
+"""
+
+QUERY_PLAN_CHECKS.append(("render queue claim", RENDER_CLAIM_SQL, (1.7e9, "", 1.7e9)))
+
+
+class RenderQueue:
+    """Renders PDFs and images on worker threads from jobs persisted in render_jobs.
+
+    Jobs survive restarts and are shared by every process on the database:
+    a worker claims one inside BEGIN IMMEDIATE, renders outside any
+    transaction and records the result. Failures are retried with
+    exponential backoff up to ``max_attempts``.
+    """
+
+    poll_interval = 30.0
+    lease = 300.0
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        workers: int,
+        max_attempts: int,
+        retry_delay: float,
+    ) -> None:
+        self.pool = pool
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._threads: list[threading.Thread] = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def submit(self, conn: sqlite3.Connection, kind: str, ref_id: int) -> int:
+        # Runs in the caller's transaction; call wake() once it has committed.
+        if kind not in RENDERERS:
+            raise ValueError(f"unknown render job kind {kind!r}")
+        now = now_str()
+        cur = conn.execute(
+            """
+            INSERT INTO render_jobs (kind, ref_id, run_after, created_at, updated_at)
+            VALUES (?, ?, 0, ?, ?)
+            """,
+            (kind, ref_id, now, now),
+        )
+        return int(cur.lastrowid)
+
+    def submit_many(self, conn: sqlite3.Connection, kind: str, ref_ids: Iterable[int]) -> None:
+        if kind not in RENDERERS:
+            raise ValueError(f"unknown render job kind {kind!r}")
+        now = now_str()
+        conn.executemany(
+            """
+            INSERT INTO render_jobs (kind, ref_id, run_after, created_at, updated_at)
+            VALUES (?, ?, 0, ?, ?)
+            """,
+            [(kind, ref_id, now, now) for ref_id in ref_ids],
+        )
+
+    def wake(self) -> None:
+        self.start()
+        self._wake.set()
+
+    def start(self) -> None:
+        # Like the checkpointer, threads start lazily so forked workers get their own.
+        if self.workers <= 0:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            self._threads = [
+                threading.Thread(target=self._work_loop, name=f"render-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def _work_loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                worked = self.run_next()
+            except sqlite3.Error:
+                worked = False
+            if not worked:
+                self._wake.wait(self.poll_interval)
+
+    def _claim(self, conn: sqlite3.Connection) -> sqlite3.Row | None:
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            job = conn.execute(
+                RENDER_CLAIM_SQL, (now + self.lease, now_str(), now)
+            ).fetchone()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return job
+
+    def run_next(self) -> bool:
+        """Claim and render one due job; False when nothing is due."""
+        conn = self.pool.acquire()
+        try:
+            job = self._claim(conn)
+            if job is None:
+                return False
+            try:
+                output = RENDERERS[job["kind"]](conn, job["ref_id"])
+            except Exception as exc:
+                # A missing source row will not come back, so don't retry it.
+                if isinstance(exc, LookupError) or job["attempts"] >= self.max_attempts:
+                    status, run_after = "failed", 0.0
+                else:
+                    status = "queued"
+                    run_after = time.time() + self.retry_delay * 2 ** (job["attempts"] - 1)
+                conn.execute(
+                    """
+                    UPDATE render_jobs
+                    SET status = ?, run_after = ?, last_error = ?, updated_at = ?
+                    WHERE id = ?
+                    """,
+                    (status, run_after, f"{type(exc).__name__}: {exc}", now_str(), job["id"]),
+                )
+            else:
+                conn.execute(
+                    """
+                    UPDATE render_jobs
+                    SET status = 'done', output = ?, last_error = NULL, updated_at = ?
+                    WHERE id = ?
+                    """,
+                    (output, now_str(), job["id"]),
+                )
+            conn.commit()
+            return True
+        finally:
+            self.pool.release(conn)
+
+    def counts(self, conn: sqlite3.Connection) -> dict[str, int]:
+        rows = conn.execute(
+            "SELECT status, COUNT(*) FROM render_jobs GROUP BY status"
+        ).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+
+render_queue = RenderQueue(
+    db_pool,
+    app.config["RENDER_WORKERS"],
+    app.config["RENDER_MAX_ATTEMPTS"],
+    app.config["RENDER_RETRY_DELAY"],
+)
+
+
+@app.cli.command("render-jobs")
+@click.option("--drain", is_flag=True, help="Render every due job in this process.")
+@click.option("--retry-failed", is_flag=True, help="Queue failed jobs for another round of attempts.")
+def render_jobs_command(drain: bool, retry_failed: bool) -> None:
+    conn = get_db()
+    if retry_failed:
+        cur = conn.execute(
+            """
+            UPDATE render_jobs
+            SET status = 'queued', attempts = 0, run_after = 0, updated_at = ?
+            WHERE status = 'failed'
+            """,
+            (now_str(),),
+        )
+        conn.commit()
+        click.echo(f"Requeued {cur.rowcount} failed jobs.")
+    if drain:
+        rendered = 0
+        while render_queue.run_next():
+            rendered += 1
+        click.echo(f"Processed {rendered} jobs.")
+    for status, count in sorted(render_queue.counts(conn).items()):
+        click.echo(f"{status:8} {count}")
+
+
+@app.cli.command("backfill-thumbnails")
+@click.option("--drain", is_flag=True, help="Render the queued jobs in this process.")
+def backfill_thumbnails_command(drain: bool) -> None:
+    conn = get_db()
+    image_ids = [
+        row[0]
+        for row in conn.execute(
+            """
+            SELECT id FROM order_images
+            WHERE derived_at IS NULL
+              AND id NOT IN (
+                  SELECT ref_id FROM render_jobs
+                  WHERE kind = 'image_derivatives' AND status IN ('queued', 'running')
+              )
+            """
+        )
+    ]
+    render_queue.submit_many(conn, "image_derivatives", image_ids)
+    conn.commit()
+    click.echo(f"Queued {len(image_ids)} images for thumbnails.")
+    if drain:
+        rendered = 0
+        while render_queue.run_next():
+            rendered += 1
+        click.echo(f"Processed {rendered} jobs.")
+
+
+@app.cli.command("gc-uploads")
+@click.option("--dry-run", is_flag=True, help="Report what would be deleted without deleting it.")
+@click.option(
+    "--grace",
+    type=int,
+    default=UPLOAD_GC_GRACE,
+    show_default=True,
+    help="Keep unreferenced files modified within this many seconds.",
+)
+def gc_uploads_command(dry_run: bool, grace: int) -> None:
+    files, freed = collect_upload_garbage(get_db(), grace=grace, dry_run=dry_run)
+    verb = "Would remove" if dry_run else "Removed"
+    click.echo(f"{verb} {files} files ({freed / 1024 / 1024:.1f} MB).")
+
+
+def upsert_customer(
+    name: str,
+    phone: str,
+    notes: str | None,
+    conn: sqlite3.Connection | None = None,
+) -> int:
+    owns_conn = conn is None
+    conn = conn or get_db()
+    cur = conn.cursor()
+    phone_digits = normalize_phone(phone)
+    cur.execute("SELECT id FROM customers WHERE phone = ?", (phone,))
+    row = cur.fetchone()
+    if not row and phone_digits:
+        cur.execute(
+            "SELECT id FROM customers WHERE phone_digits = ? ORDER BY id ASC LIMIT 1",
+            (phone_digits,),
+        )
+        row = cur.fetchone()
+    if row:
+        customer_id = row[0]
+        cur.execute(
+            "UPDATE customers SET name = ?, notes = ? WHERE id = ?",
+            (name, notes, customer_id),
+        )
+    else:
+        cur.execute(
+            """
+            INSERT INTO customers (name, phone, phone_digits, notes, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (name, phone, phone_digits, notes, now_str()),
+        )
+        customer_id = cur.lastrowid
+    if owns_conn:
+        conn.commit()
+        suggest_cache.clear()
+    return int(customer_id)
+
+
+def parse_measure(value: str | float) -> float:
+    """Read a measurement as entered: "15 1/2", "15-1/2", "15½" and "15.5" are 15.5.
+
+    Only finite, positive lengths are measurements; anything else is a ValueError.
+    """
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        text = value.strip()
+        # "-" joins a whole number to its fraction, so a leading one is a sign.
+        if text.startswith("-"):
+            raise ValueError(f"not a measurement: {value!r}")
+        text = text.replace("-", " ")
+        for glyph, fraction in (("¼", " 1/4"), ("½", " 1/2"), ("¾", " 3/4")):
+            text = text.replace(glyph, fraction)
+        parts = text.split()
+        if not parts:
+            raise ValueError(f"not a measurement: {value!r}")
+        try:
+            number = float(sum(Fraction(part) for part in parts))
+        except (ZeroDivisionError, OverflowError):
+            raise ValueError(f"not a measurement: {value!r}") from None
+    if not 0 < number < float("inf"):
+        raise ValueError(f"not a measurement: {value!r}")
+    return number
+
+
+def insert_measurement(
+    conn: sqlite3.Connection,
+    customer_id: int,
+    kind: str,
+    subcategory_id: int | None,
+    values: dict[int, str | float | None],
+    notes: str | None,
+    created_at: str,
+) -> int | None:
+    """Insert a measurement and its values by field id; None when it is blank.
+
+    Values are parsed here, so measurement_values only ever holds numbers.
+    """
+    parsed = [
+        (field_id, parse_measure(value))
+        for field_id, value in values.items()
+        if value is not None and value != ""
+    ]
+    if not parsed and not notes:
+        return None
+    cur = conn.execute(
+        """
+        INSERT INTO measurements (customer_id, kind, subcategory_id, notes, created_at)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (customer_id, kind, subcategory_id, notes or None, created_at),
+    )
+    measurement_id = int(cur.lastrowid)
+    conn.executemany(
+        "INSERT INTO measurement_values (measurement_id, field_id, value) VALUES (?, ?, ?)",
+        [(measurement_id, field_id, value) for field_id, value in parsed],
+    )
+    return measurement_id
+
+
+def insert_legacy_measurement(
+    conn: sqlite3.Connection, customer_id: int, kind: str, fields: dict[str, str]
+) -> None:
+    """Write a measurement to the wide columns of a pre-migration-10 database.
+
+    Frozen for migration 1's seed step; migration 10 moves these rows into
+    measurement_values.
+    """
+    values = [fields.get(column) or None for column in LEGACY_MEASURE_COLUMNS]
+    notes = fields.get("notes") or None
+    if not any(values) and not notes:
+        return
+    conn.execute(
+        f"""
+        INSERT INTO measurements (
+            customer_id, kind, {", ".join(LEGACY_MEASURE_COLUMNS)}, notes, created_at
+        )
+        VALUES (?, ?, {", ".join("?" * len(LEGACY_MEASURE_COLUMNS))}, ?, ?)
+        """,
+        (customer_id, kind, *values, notes, now_str()),
+    )
+
+
+def create_measurement(
+    customer_id: int,
+    kind: str,
+    subcategory_id: int | None,
+    values: dict[int, str | float | None],
+    notes: str | None = None,
+    conn: sqlite3.Connection | None = None,
+) -> int | None:
+    owns_conn = conn is None
+    conn = conn or get_db()
+    measurement_id = insert_measurement(
+        conn, customer_id, kind, subcategory_id, values, notes, now_str()
+    )
+    if owns_conn:
+        conn.commit()
+    measurement_cache.invalidate(customer_id)
+    return measurement_id
+
+
+# Each customer's newest measurement of every kind, walked off
+# idx_measurements_customer_kind; ties within a minute go to the later row.
+LATEST_MEASUREMENTS_SQL = """
+    SELECT m.id, m.customer_id, m.kind, m.subcategory_id, s.category_id, m.notes, m.created_at
+    FROM measurements m
+    LEFT JOIN subcategories s ON s.id = m.subcategory_id
+    WHERE m.customer_id IN ({marks})
+      AND m.id = (
+          SELECT latest.id FROM measurements latest
+          WHERE latest.customer_id = m.customer_id AND latest.kind = m.kind
+          ORDER BY latest.created_at DESC, latest.id DESC
+          LIMIT 1
+      )
+    ORDER BY m.customer_id, m.created_at DESC, m.id DESC
+"""
+
+MEASUREMENT_VALUES_SQL = """
+    SELECT v.measurement_id, v.field_id, f.field_key, f.field_label, v.value
+    FROM measurement_values v
+    JOIN measurement_fields f ON f.id = v.field_id
+    WHERE v.measurement_id IN ({marks})
+    ORDER BY v.measurement_id, f.sort_order, f.id
+"""
+
+QUERY_PLAN_CHECKS.extend(
+    [
+        ("latest measurements", LATEST_MEASUREMENTS_SQL.format(marks="?, ?"), (1, 2)),
+        ("latest measurement values", MEASUREMENT_VALUES_SQL.format(marks="?, ?"), (1, 2)),
+    ]
+)
+
+# Customers per /api/measurements/latest call.
+LATEST_MEASUREMENTS_BATCH = 200
+
+
+def load_latest_measurements(
+    conn: sqlite3.Connection, customer_ids: list[int]
+) -> dict[int, list[dict]]:
+    latest: dict[int, list[dict]] = {customer_id: [] for customer_id in customer_ids}
+    measurements = {}
+    marks = ", ".join("?" * len(customer_ids))
+    for row in conn.execute(LATEST_MEASUREMENTS_SQL.format(marks=marks), customer_ids):
+        measurement = dict(row, values=[])
+        measurements[row["id"]] = measurement
+        latest[row["customer_id"]].append(measurement)
+    if measurements:
+        marks = ", ".join("?" * len(measurements))
+        for row in conn.execute(MEASUREMENT_VALUES_SQL.format(marks=marks), list(measurements)):
+            measurements[row["measurement_id"]]["values"].append(
+                {
+                    "field_id": row["field_id"],
+                    "key": row["field_key"],
+                    "label": row["field_label"],
+                    "value": row["value"],
+                    "display": format_measure(row["value"]),
+                }
+            )
+    return latest
+
+
+def latest_measurements(
+    conn: sqlite3.Connection, customer_ids: Iterable[int]
+) -> dict[int, list[dict]]:
+    """Newest measurement of each kind per customer, via measurement_cache."""
+    customer_ids = list(dict.fromkeys(customer_ids))
+    # Measurements are only ever appended, so a new highest id means some
+    # process wrote one since the cache was filled.
+    newest = conn.execute("SELECT MAX(id) FROM measurements").fetchone()[0]
+    return measurement_cache.get_many(
+        customer_ids, lambda missing: load_latest_measurements(conn, missing), version=newest
+    )
+
+
+def find_tailor(
+    conn: sqlite3.Connection, tailor_id: int | None, name: str | None = None
+) -> sqlite3.Row | None:
+    """The tailor an order is assigned to, by id or, for older callers, by name."""
+    if tailor_id:
+        return conn.execute(
+            "SELECT id, name, team FROM tailors WHERE id = ?", (tailor_id,)
+        ).fetchone()
+    if name:
+        return conn.execute(
+            "SELECT id, name, team FROM tailors WHERE name = ? ORDER BY id LIMIT 1", (name,)
+        ).fetchone()
+    return None
+
+
+def create_order(
+    conn: sqlite3.Connection,
+    customer: dict[str, str | None],
+    measurements: list[tuple[str, int | None, dict[int, str | float | None], str | None]],
+    order: dict[str, object],
+    items: list[tuple[str, int, str | None]],
+    images: list[tuple[str, str]],
+) -> int:
+    """Create a customer's order and everything hanging off it in one transaction.
+
+    ``measurements`` are (kind, subcategory_id, values by field id, notes),
+    ``items`` are (item_type, qty, notes) and ``images`` are (filename, label)
+    for files already on disk. ``order`` holds the orders columns, with the
+    tailor as assigned_tailor_id or an assigned_tailor name. An open
+    transaction on ``conn`` is joined and left for the caller to commit.
+    """
+    created_at = now_str()
+    owns_tx = not conn.in_transaction
+    if owns_tx:
+        # Take the write lock up front: a deferred transaction that reads
+        # first can fail to upgrade under WAL without waiting on busy_timeout.
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        customer_id = upsert_customer(
+            customer["name"], customer["phone"], customer.get("notes"), conn
+        )
+        for kind, subcategory_id, values, notes in measurements:
+            insert_measurement(conn, customer_id, kind, subcategory_id, values, notes, created_at)
+
+        tailor = find_tailor(conn, order.get("assigned_tailor_id"), order.get("assigned_tailor"))
+        assigned_team = order.get("assigned_team")
+        if assigned_team is None and tailor:
+            assigned_team = tailor["team"]
+
+        cur = conn.execute(
+            """
+            INSERT INTO orders (
+                customer_id, due_date, status, priority,
+                assigned_team, assigned_tailor, assigned_tailor_id, notes,
+                advance_amount, total_amount, created_at
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                customer_id,
+                order.get("due_date"),
+                order.get("status") or "Pending",
+                order.get("priority") or "Normal",
+                assigned_team,
+                tailor["name"] if tailor else None,
+                tailor["id"] if tailor else None,
+                order.get("notes"),
+                order.get("advance_amount"),
+                order.get("total_amount"),
+                created_at,
+            ),
+        )
+        order_id = int(cur.lastrowid)
+        conn.executemany(
+            "INSERT INTO order_items (order_id, item_type, qty, notes) VALUES (?, ?, ?, ?)",
+            [(order_id, item_type, qty, note) for item_type, qty, note in items],
+        )
+        conn.executemany(
+            "INSERT INTO order_images (order_id, filename, label) VALUES (?, ?, ?)",
+            [(order_id, filename, label) for filename, label in images],
+        )
+        if images:
+            image_ids = [
+                row[0]
+                for row in conn.execute(
+                    "SELECT id FROM order_images WHERE order_id = ?", (order_id,)
+                )
+            ]
+            render_queue.submit_many(conn, "image_derivatives", image_ids)
+        if owns_tx:
+            conn.commit()
+    except Exception:
+        if owns_tx:
+            conn.rollback()
+        raise
+    dashboard_cache.clear()
+    suggest_cache.clear()
+    if measurements:
+        measurement_cache.invalidate(customer_id)
+    if images and owns_tx:
+        render_queue.wake()
+    return order_id
+
+
+# One row per order; items and the customer's latest measurement of each
+# kind come back as JSON arrays so a whole print run is a single query.
+ORDER_TICKET_SQL = """
+    SELECT o.id, o.due_date, o.status, o.priority, o.assigned_tailor, o.notes,
+           o.advance_amount, o.total_amount, o.created_at,
+           c.name, c.phone,
+           (
+               SELECT json_group_array(json_array(i.item_type, i.qty, i.notes))
+               FROM order_items i
+               WHERE i.order_id = o.id
+           ) AS items_json,
+           (
+               SELECT json_group_array(json_array(m.kind, m.notes, json((
+                   SELECT json_group_array(json_array(f.sort_order, f.field_label, v.value))
+                   FROM measurement_values v
+                   JOIN measurement_fields f ON f.id = v.field_id
+                   WHERE v.measurement_id = m.id
+               ))))
+               FROM measurements m
+               WHERE m.customer_id = o.customer_id
+                 AND m.id = (
+                     SELECT MAX(latest.id) FROM measurements latest
+                     WHERE latest.customer_id = m.customer_id AND latest.kind = m.kind
+                 )
+           ) AS measurements_json
+    FROM orders o
+    JOIN customers c ON c.id = o.customer_id
+    WHERE {where}
+    ORDER BY {order_by}
+"""
+
+
+QUERY_PLAN_CHECKS.append(
+    ("order ticket", ORDER_TICKET_SQL.format(where="o.id = ?", order_by="o.id"), (1000,))
+)
+
+
+def iter_order_tickets(
+    conn: sqlite3.Connection,
+    where: str,
+    params: tuple | list,
+    order_by: str = "o.id",
+):
+    """Yield ticket dicts for the matching orders, streaming from the cursor."""
+    cur = conn.execute(ORDER_TICKET_SQL.format(where=where, order_by=order_by), params)
+    for row in cur:
+        ticket = dict(row)
+        ticket["items"] = json.loads(ticket.pop("items_json"))
+        ticket["measurements"] = [
+            (kind, notes, [(label, value) for _order, label, value in sorted(values)])
+            for kind, notes, values in json.loads(ticket.pop("measurements_json"))
+        ]
+        yield ticket
+
+
+# Orders printed by the morning run for one due date.
+PRINT_BATCH_WHERE = "o.due_date = ? AND o.status != 'Completed'"
+
+QUERY_PLAN_CHECKS.append(
+    ("print batch", ORDER_TICKET_SQL.format(where=PRINT_BATCH_WHERE, order_by="o.id"), ("2025-03-04",))
+)
+
+
+def render_due_tickets(conn: sqlite3.Connection, due: str, target) -> int:
+    """Write the tickets of every open order due on ``due`` as one PDF."""
+    return render_order_tickets(target, iter_order_tickets(conn, PRINT_BATCH_WHERE, (due,)))
+
+
+def format_measure(value: object) -> str:
+    """15.5 prints as "15 1/2", the way the tape is read; other decimals stay as-is."""
+    if not isinstance(value, float):
+        return str(value)
+    exact = Fraction(value)
+    # Halves, quarters, eighths and sixteenths only.
+    if exact.denominator > 16 or exact.denominator & (exact.denominator - 1):
+        return f"{value:g}"
+    whole, part = divmod(exact, 1)
+    if not part:
+        return str(whole)
+    return f"{whole} {part}" if whole else str(part)
+
+
+def order_ticket_lines(ticket: dict) -> list[ThermalLine]:
+    requirements = ""
+    notes = ticket["notes"] or ""
+    # order_new stores the picked requirement icons as the first line of notes.
+    if notes.startswith("Requirements: "):
+        requirements, _, notes = notes.partition("\n")
+        requirements = requirements.removeprefix("Requirements: ")
+
+    lines = [
+        ("PREMIER TAILORS", True),
+        ("Job Ticket", True),
+        THERMAL_RULE,
+        (f"Order No : {ticket['id']}", True),
+        (f"Date     : {ticket['created_at']}", False),
+        (f"Due      : {ticket['due_date'] or '-'}", True),
+        (f"Priority : {ticket['priority']}", ticket["priority"] != "Normal"),
+        (f"Tailor   : {ticket['assigned_tailor'] or '-'}", False),
+        THERMAL_RULE,
+        (f"Customer : {ticket['name']}", True),
+        (f"Phone    : {ticket['phone']}", False),
+        THERMAL_RULE,
+        ("Items:", True),
+    ]
+    for item_type, qty, item_notes in ticket["items"]:
+        lines.append((f"{qty} x {item_type}", False))
+        if item_notes:
+            lines.append((f"   {item_notes}", False))
+    if not ticket["items"]:
+        lines.append(("-", False))
+
+    if ticket["measurements"]:
+        lines += [THERMAL_RULE, ("Measurements:", True)]
+        for kind, measure_notes, values in ticket["measurements"]:
+            lines.append((kind, True))
+            if values:
+                sizes = [f"{label} {format_measure(value)}" for label, value in values]
+                lines.append((", ".join(sizes), False))
+            if measure_notes:
+                lines.append((measure_notes, False))
+
+    if requirements or notes.strip():
+        lines.append(THERMAL_RULE)
+        if requirements:
+            lines.append((f"Requirements: {requirements}", False))
+        if notes.strip():
+            lines.append((f"Notes: {notes.strip()}", False))
+
+    total = ticket["total_amount"]
+    advance = ticket["advance_amount"]
+    lines.append(THERMAL_RULE)
+    lines.append((f"Total    : Rs. {total:.2f}" if total is not None else "Total    : -", False))
+    lines.append((f"Advance  : Rs. {advance or 0:.2f}", False))
+    if total is not None:
+        lines.append((f"Balance  : Rs. {total - (advance or 0):.2f}", True))
+    return lines
+
+
+def render_order_tickets(target, tickets: Iterable[dict]) -> int:
+    """Write one thermal page per ticket to target; returns the page count."""
+    doc = ThermalDocument(target)
+    for ticket in tickets:
+        doc.add_page(order_ticket_lines(ticket))
+    doc.save()
+    return doc.pages
+
+
+def generate_tailor_code(conn: sqlite3.Connection, preview: bool = False) -> str:
+    number = peek_sequence(conn, "tailor_code") if preview else next_sequence(conn, "tailor_code")
+    return f"TLR{number:03d}"
+
+
+def inventory_code_prefix(name: str) -> str:
+    base = "".join(ch for ch in name.upper() if ch.isalnum())
+    return base[:3] if len(base) >= 3 else (base or "INV")
+
+
+def generate_inventory_codes(conn: sqlite3.Connection, names: list[str]) -> list[str]:
+    """Codes for a batch of new items, one block reservation per name prefix."""
+    prefixes = [inventory_code_prefix(name) for name in names]
+    counts: dict[str, int] = {}
+    for prefix in prefixes:
+        counts[prefix] = counts.get(prefix, 0) + 1
+    next_number = {
+        prefix: next_sequence(conn, f"inventory:{prefix}", count)
+        for prefix, count in counts.items()
+    }
+    codes = []
+    for prefix in prefixes:
+        codes.append(f"{prefix}-{next_number[prefix]:03d}")
+        next_number[prefix] += 1
+    return codes
+
+
+def generate_inventory_code(conn: sqlite3.Connection, name: str) -> str:
+    return generate_inventory_codes(conn, [name])[0]
+
+
+IMPORT_BATCH_SIZE = 500
+
+INVENTORY_UPSERT = """
+    INSERT INTO inventory (inventory_code, name, supplier, qty, uom_id, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (inventory_code) DO UPDATE SET
+        name = excluded.name,
+        supplier = COALESCE(excluded.supplier, inventory.supplier),
+        qty = {qty},
+        uom_id = COALESCE(excluded.uom_id, inventory.uom_id),
+        updated_at = excluded.updated_at
+"""
+INVENTORY_QTY_MODES = {
+    "add": "inventory.qty + excluded.qty",
+    "set": "excluded.qty",
+}
+# Far above any real stock count, and small enough that "add" imports stay
+# within SQLite's 64-bit INTEGER instead of failing the bind or going REAL.
+INVENTORY_MAX_QTY = 10**9
+
+
+def import_inventory_csv(
+    conn: sqlite3.Connection,
+    lines: Iterable[str],
+    batch_size: int = IMPORT_BATCH_SIZE,
+    qty_mode: str = "add",
+) -> dict:
+    """Upsert inventory from CSV text, one batch of rows per transaction.
+
+    The header needs a ``name`` column; ``code``, ``vendor`` (or
+    ``supplier``), ``qty`` and ``uom`` are optional. Rows with a known code,
+    or without a code but matching an existing item name, update that item;
+    ``qty_mode`` "add" adds the quantity (a delivery), "set" replaces it.
+    Other rows are inserted with codes reserved a block per batch. Bad rows
+    are reported as (line, message) and skipped; earlier batches stay
+    committed.
+    """
+    if qty_mode not in INVENTORY_QTY_MODES:
+        raise ValueError(f"unknown qty mode {qty_mode!r}")
+    reader = csv.DictReader(lines)
+    columns = {(field or "").strip().lower(): field for field in reader.fieldnames or []}
+    if "name" not in columns:
+        raise ValueError("The CSV needs a header row with at least a name column.")
+    columns.setdefault("vendor", columns.get("supplier"))
+
+    uoms = {row["name"].strip().lower(): row["id"] for row in conn.execute("SELECT id, name FROM uoms")}
+    vendors = {row["name"].strip().lower(): row["name"] for row in conn.execute("SELECT name FROM vendors")}
+    upsert = INVENTORY_UPSERT.format(qty=INVENTORY_QTY_MODES[qty_mode])
+    result = {"rows": 0, "inserted": 0, "updated": 0, "errors": []}
+    # Codes already given to names in this run, so a repeated name in a
+    # later batch updates the item instead of creating a second one.
+    known: dict[str, str] = {}
+
+    def value(raw: dict, column: str) -> str:
+        field = columns.get(column)
+        return (raw.get(field) or "").strip() if field else ""
+
+    batch = []
+    for raw in reader:
+        result["rows"] += 1
+        line = reader.line_num
+        name = value(raw, "name")
+        qty = value(raw, "qty") or "0"
+        uom = value(raw, "uom").lower()
+        vendor = value(raw, "vendor").lower()
+        if not name:
+            result["errors"].append((line, "name is required"))
+        elif not (qty.isascii() and qty.isdigit()):
+            result["errors"].append((line, f"qty {qty!r} is not a whole number"))
+        elif int(qty) > INVENTORY_MAX_QTY:
+            result["errors"].append((line, f"qty {qty} is too large"))
+        elif uom and uom not in uoms:
+            result["errors"].append((line, f"unknown UOM {value(raw, 'uom')!r}"))
+        elif vendor and vendor not in vendors:
+            result["errors"].append((line, f"unknown vendor {value(raw, 'vendor')!r}"))
+        else:
+            batch.append(
+                (line, value(raw, "code") or None, name, vendors.get(vendor), int(qty), uoms.get(uom))
+            )
+        if len(batch) >= batch_size:
+            upsert_inventory_batch(conn, batch, upsert, known, result)
+            batch = []
+    if batch:
+        upsert_inventory_batch(conn, batch, upsert, known, result)
+    if result["inserted"] or result["updated"]:
+        dashboard_cache.clear()
+    return result
+
+
+def upsert_inventory_batch(
+    conn: sqlite3.Connection,
+    batch: list[tuple],
+    upsert: str,
+    known: dict[str, str],
+    result: dict,
+) -> None:
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        given = [row[1] for row in batch if row[1]]
+        existing = set(known.values())
+        if given:
+            marks = ", ".join("?" * len(given))
+            existing.update(
+                code for (code,) in conn.execute(
+                    f"SELECT inventory_code FROM inventory WHERE inventory_code IN ({marks})", given
+                )
+            )
+        unresolved = list(dict.fromkeys(row[2] for row in batch if not row[1] and row[2] not in known))
+        if unresolved:
+            marks = ", ".join("?" * len(unresolved))
+            for name, code in conn.execute(
+                f"""
+                SELECT name, inventory_code FROM inventory
+                WHERE name IN ({marks}) AND inventory_code IS NOT NULL
+                ORDER BY id DESC
+                """,
+                unresolved,
+            ):
+                known[name] = code  # the oldest item with the name wins
+                existing.add(code)
+            new_names = [name for name in unresolved if name not in known]
+            known.update(zip(new_names, generate_inventory_codes(conn, new_names)))
+        # Explicit codes must not be handed out again by the sequence later.
+        advance_sequences(conn, inventory_sequence_floors(given))
+
+        updated_at = now_str()
+        rows = []
+        for line, code, name, supplier, qty, uom_id in batch:
+            code = code or known[name]
+            rows.append((line, code in existing, (code, name, supplier, qty, uom_id, updated_at)))
+            existing.add(code)
+
+        conn.execute("SAVEPOINT inventory_batch")
+        try:
+            conn.executemany(upsert, [params for _line, _update, params in rows])
+            applied = rows
+        except sqlite3.Error:
+            # Find the offending rows one at a time instead of dropping the batch.
+            conn.execute("ROLLBACK TO inventory_batch")
+            applied = []
+            for row in rows:
+                try:
+                    conn.execute(upsert, row[2])
+                    applied.append(row)
+                except sqlite3.Error as exc:
+                    result["errors"].append((row[0], str(exc)))
+        conn.execute("RELEASE inventory_batch")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    for _line, update, _params in applied:
+        result["updated" if update else "inserted"] += 1
+
+
+def generate_vendor_code(conn: sqlite3.Connection, preview: bool = False) -> str:
+    number = peek_sequence(conn, "vendor_code") if preview else next_sequence(conn, "vendor_code")
+    return f"VND{number:04d}"
+
+
+def fts_query(text: str) -> str | None:
+    # Every word becomes a quoted prefix term, so user input can never be
+    # parsed as FTS5 syntax. Terms are ANDed together.
+    words = ["".join(ch for ch in word if ch.isalnum()) for word in text.split()]
+    words = [word for word in words if word]
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+SEARCH_RANK_WINDOW = 500
+
+
+def search_everything(conn: sqlite3.Connection, text: str, limit: int = 20) -> list[dict]:
+    match = fts_query(text)
+    if not match:
+        return []
+    # bm25 weights: a hit in the name/phone/item title counts 10x one in notes.
+    # Only the newest SEARCH_RANK_WINDOW matches are ranked; walking a doclist
+    # by rowid is cheap, scoring every "shirt" ever sold is not.
+    hits = conn.execute(
+        """
+        SELECT rowid,
+               snippet(search_index, 1, '[', ']', '...', 10) AS snippet,
+               bm25(search_index, 10.0, 1.0) AS score
+        FROM search_index
+        WHERE search_index MATCH ?1
+          AND rowid >= (
+            SELECT COALESCE(MIN(rowid), 0) FROM (
+                SELECT rowid FROM search_index
+                WHERE search_index MATCH ?1
+                ORDER BY rowid DESC
+                LIMIT ?2
+            )
+          )
+        ORDER BY score
+        LIMIT ?3
+        """,
+        (match, SEARCH_RANK_WINDOW, limit),
+    ).fetchall()
+
+    ids: dict[str, list[int]] = {kind: [] for kind in SEARCH_KINDS.values()}
+    for hit in hits:
+        ids[SEARCH_KINDS[hit["rowid"] % 4]].append(hit["rowid"] // 4)
+
+    def fetch(sql: str, kind: str) -> dict[int, sqlite3.Row]:
+        if not ids[kind]:
+            return {}
+        marks = ",".join("?" * len(ids[kind]))
+        return {row["id"]: row for row in conn.execute(sql.format(marks=marks), ids[kind])}
+
+    customers = fetch("SELECT id, name, phone FROM customers WHERE id IN ({marks})", "customer")
+    orders = fetch(
+        """
+        SELECT orders.id, orders.status, customers.name
+        FROM orders
+        JOIN customers ON customers.id = orders.customer_id
+        WHERE orders.id IN ({marks})
+        """,
+        "order",
+    )
+    items = fetch(
+        """
+        SELECT order_items.id, order_items.order_id, order_items.item_type, customers.name
+        FROM order_items
+        JOIN orders ON orders.id = order_items.order_id
+        JOIN customers ON customers.id = orders.customer_id
+        WHERE order_items.id IN ({marks})
+        """,
+        "item",
+    )
+
+    results = []
+    for hit in hits:
+        kind = SEARCH_KINDS[hit["rowid"] % 4]
+        row_id = hit["rowid"] // 4
+        if kind == "customer" and row_id in customers:
+            row = customers[row_id]
+            title = f"{row['name']} ({row['phone']})"
+            url = url_for("customer_detail", customer_id=row_id)
+        elif kind == "order" and row_id in orders:
+            row = orders[row_id]
+            title = f"Order #{row_id} - {row['name']} ({row['status']})"
+            url = url_for("order_detail", order_id=row_id)
+        elif kind == "item" and row_id in items:
+            row = items[row_id]
+            title = f"{row['item_type']} on order #{row['order_id']} - {row['name']}"
+            url = url_for("order_detail", order_id=row["order_id"])
+        else:
+            continue
+        results.append(
+            {
+                "type": kind,
+                "id": row_id,
+                "title": title,
+                "snippet": hit["snippet"],
+                "url": url,
+                "score": round(-hit["score"], 4),
+            }
+        )
+    return results
+
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def page_size() -> int:
+    raw = request.args.get("limit", "")
+    try:
+        size = int(raw) if raw.isdigit() else PAGE_SIZE
+    except ValueError:
+        # isdigit() also accepts digits such as "²" that int() rejects.
+        size = PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(sort_value: object, row_id: int) -> str:
+    raw = json.dumps([sort_value, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple[object, int] | None:
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        sort_value, row_id = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    # Both halves are bound straight into the keyset comparison.
+    if not isinstance(sort_value, (str, int, float, type(None))) or type(row_id) is not int:
+        return None
+    return sort_value, row_id
+
+
+def column_filters(spec: dict[str, str]) -> tuple[list[str], list[str], dict[str, str]]:
+    # spec maps a query-string argument to the column it filters.
+    clauses, params, values = [], [], {}
+    for arg, column in spec.items():
+        value = request.args.get(arg, "").strip()
+        if value:
+            clauses.append(f"{column} LIKE ?")
+            params.append(f"%{value}%")
+            values[arg] = value
+    return clauses, params, values
+
+
+def keyset_sql(
+    sql: str,
+    where: list[str],
+    sort_column: str,
+    id_column: str,
+    after: bool = False,
+    descending: bool = True,
+) -> str:
+    """``sql`` filtered and ordered the way keyset_page runs it.
+
+    Binds the ``where`` params, then the cursor's (sort value, id) when
+    ``after`` is set, then the row limit.
+    """
+    where = list(where)
+    direction = "DESC" if descending else "ASC"
+    if after:
+        where.append(f"({sort_column}, {id_column}) {'<' if descending else '>'} (?, ?)")
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + f" ORDER BY {sort_column} {direction}, {id_column} {direction} LIMIT ?"
+
+
+def keyset_page(
+    conn: sqlite3.Connection,
+    sql: str,
+    where: list[str],
+    params: list,
+    sort_column: str,
+    id_column: str,
+    cursor_arg: str = "after",
+    descending: bool = True,
+) -> tuple[list[sqlite3.Row], dict[str, str | None]]:
+    # Seeks past the last (sort value, id) seen instead of using OFFSET, so
+    # every page costs the same however deep into history it is. Rows must
+    # expose the sort value and id under the bare column names.
+    size = page_size()
+    cursor = decode_cursor(request.args.get(cursor_arg, ""))
+    sql = keyset_sql(sql, where, sort_column, id_column, cursor is not None, descending)
+    rows = conn.execute(sql, (*params, *(cursor or ()), size + 1)).fetchall()
+
+    page: dict[str, str | None] = {"first": None, "next": None}
+    if cursor:
+        args = request.args.to_dict()
+        args.pop(cursor_arg)
+        page["first"] = url_for(request.endpoint, **args)
+    if len(rows) > size:
+        rows = rows[:size]
+        last = rows[-1]
+        args = request.args.to_dict()
+        args[cursor_arg] = encode_cursor(last[sort_column.split(".")[-1]], last["id"])
+        page["next"] = url_for(request.endpoint, **args)
+    return rows, page
+
+
+# Tailors with their open workload: counters from tailor_workload and the
+# next due date from idx_orders_tailor_open_due, so each row is a lookup
+# and a seek however many orders a tailor has had.
+TAILOR_WORKLOAD_SQL = """
+    SELECT t.id, t.tailor_code, t.name, t.role, t.team, t.phone, t.status,
+           COALESCE(w.open_orders, 0) AS open_orders,
+           COALESCE(w.open_pieces, 0) AS open_pieces,
+           (
+               SELECT MIN(o.due_date)
+               FROM orders o
+               WHERE o.assigned_tailor_id = t.id AND o.status != 'Completed'
+                 AND o.due_date IS NOT NULL
+           ) AS next_due
+    FROM tailors t
+    LEFT JOIN tailor_workload w ON w.tailor_id = t.id
+    WHERE {where}
+    ORDER BY {order_by}
+"""
+
+QUERY_PLAN_CHECKS.append(
+    ("tailor workload", TAILOR_WORKLOAD_SQL.format(where="t.id = ?", order_by="t.id"), (1,))
+)
+
+
+def tailor_workloads(
+    conn: sqlite3.Connection, order_by: str = "t.team, t.name"
+) -> list[sqlite3.Row]:
+    return conn.execute(TAILOR_WORKLOAD_SQL.format(where="1", order_by=order_by)).fetchall()
+
+
+def tailor_open_orders(conn: sqlite3.Connection) -> dict[int, int]:
+    # The live half of the order form's tailor list; names come from the
+    # cached reference bundle.
+    return dict(conn.execute("SELECT tailor_id, open_orders FROM tailor_workload").fetchall())
+
+
+DASHBOARD_RECENT_ORDERS_SQL = """
+    SELECT orders.*, customers.name, customers.phone
+    FROM orders
+    JOIN customers ON customers.id = orders.customer_id
+    ORDER BY orders.created_at DESC
+    LIMIT 8
+"""
+
+DASHBOARD_ACTIVE_ORDERS_SQL = """
+    SELECT orders.*, customers.name, customers.phone
+    FROM orders
+    JOIN customers ON customers.id = orders.customer_id
+    WHERE orders.status != 'Completed'
+    ORDER BY orders.due_date IS NULL, orders.due_date ASC, orders.created_at DESC
+    LIMIT 8
+"""
+
+DASHBOARD_LOW_STOCK_SQL = """
+    SELECT * FROM inventory
+    WHERE qty <= 5
+    ORDER BY qty ASC
+    LIMIT 6
+"""
+
+# Open orders with pieces of one item type, soonest due first.
+DASHBOARD_ITEM_QUEUE_SQL = """
+    SELECT orders.id, orders.status, orders.due_date, customers.name, SUM(order_items.qty) as total_qty
+    FROM orders
+    JOIN customers ON customers.id = orders.customer_id
+    JOIN order_items ON order_items.order_id = orders.id
+    WHERE order_items.item_type = ? AND orders.status != 'Completed'
+    GROUP BY orders.id
+    ORDER BY orders.due_date IS NULL, orders.due_date ASC
+    LIMIT 6
+"""
+
+QUERY_PLAN_CHECKS.extend(
+    [
+        ("dashboard recent orders", DASHBOARD_RECENT_ORDERS_SQL, ()),
+        ("dashboard active orders", DASHBOARD_ACTIVE_ORDERS_SQL, ()),
+        ("dashboard low stock", DASHBOARD_LOW_STOCK_SQL, ()),
+        ("dashboard shirt queue", DASHBOARD_ITEM_QUEUE_SQL, ("Shirt",)),
+    ]
+)
+
+
+def load_dashboard_stats(conn: sqlite3.Connection) -> dict:
+    stats = read_stats(conn)
+    counts = {
+        key.split(":", 1)[1]: int(value)
+        for key, value in stats.items()
+        if key.startswith("orders_status:") and value
+    }
+
+    recent_orders = conn.execute(DASHBOARD_RECENT_ORDERS_SQL).fetchall()
+
+    active_orders = conn.execute(DASHBOARD_ACTIVE_ORDERS_SQL).fetchall()
+
+    low_stock = conn.execute(DASHBOARD_LOW_STOCK_SQL).fetchall()
+
+    shirt_queue = conn.execute(DASHBOARD_ITEM_QUEUE_SQL, ("Shirt",)).fetchall()
+
+    pant_queue = conn.execute(DASHBOARD_ITEM_QUEUE_SQL, ("Pant",)).fetchall()
+
+    tailors = tailor_workloads(conn)
+
+    return dict(
+        counts=counts,
+        total_orders=int(stats.get("orders_total", 0)),
+        total_items=int(stats.get("order_items_qty", 0)),
+        stock_units=int(stats.get("inventory_qty", 0)),
+        low_stock_count=int(stats.get("inventory_low_stock", 0)),
+        recent_orders=recent_orders,
+        low_stock=low_stock,
+        shirt_queue=shirt_queue,
+        pant_queue=pant_queue,
+        tailors=tailors,
+        active_orders=active_orders,
+        revenue=float(stats.get("revenue", 0)),
+        spent=float(stats.get("vendor_spent", 0)),
+    )
+
+
+# Customers matching the dashboard search, each with their latest order.
+PICKUP_SEARCH_SQL = """
+    SELECT customers.*,
+           orders.id AS order_id,
+           orders.status AS order_status,
+           orders.due_date AS order_due,
+           orders.notes AS order_notes
+    FROM customers
+    LEFT JOIN orders
+      ON orders.id = (
+        SELECT id FROM orders
+        WHERE customer_id = customers.id
+        ORDER BY created_at DESC
+        LIMIT 1
+      )
+    WHERE {match}
+    ORDER BY customers.name ASC
+    LIMIT 6
+"""
+
+QUERY_PLAN_CHECKS.append(
+    (
+        "dashboard phone search",
+        PICKUP_SEARCH_SQL.format(match=customer_search_clause("90000123", "customers.id")[0]),
+        tuple(phone_prefix_range("90000123")),
+    )
+)
+
+
+@app.route("/")
+def dashboard():
+    q = request.args.get("q", "").strip()
+    stats = dashboard_cache.get_or_load("dashboard", lambda: load_dashboard_stats(get_db()))
+    pickup_results = []
+    if q:
+        match_sql, match_params = customer_search_clause(q, "customers.id")
+        pickup_results = get_db().execute(
+            PICKUP_SEARCH_SQL.format(match=match_sql), match_params
+        ).fetchall()
+
+    return render_template(
+        "dashboard.html",
+        pickup_results=pickup_results,
+        q=q,
+        **stats,
+    )
+
+
+ORDERS_LIST_SQL = """
+    SELECT orders.*, customers.name, customers.phone
+    FROM orders
+    JOIN customers ON customers.id = orders.customer_id
+"""
+
+QUERY_PLAN_CHECKS.extend(
+    [
+        (
+            "orders",
+            keyset_sql(ORDERS_LIST_SQL, [], "orders.created_at", "orders.id", after=True),
+            ("2025-06-01 00:00", 1000, 51),
+        ),
+        (
+            "orders?status",
+            keyset_sql(
+                ORDERS_LIST_SQL, ["orders.status = ?"], "orders.created_at", "orders.id", after=True
+            ),
+            ("Pending", "2025-06-01 00:00", 1000, 51),
+        ),
+    ]
+)
 
 
 @app.route("/orders")
 def orders():
     status = request.args.get("status", "").strip()
     conn = get_db()
+    where, params, filters = column_filters(
+        {
+            "order": "orders.id",
+            "name": "customers.name",
+            "phone": "customers.phone",
+            "state": "orders.status",
+            "due": "orders.due_date",
+            "assigned": "orders.assigned_tailor",
+        }
+    )
     if status:
-        rows = conn.execute(
+        where.append("orders.status = ?")
+        params.append(status)
+    rows, page = keyset_page(
+        conn, ORDERS_LIST_SQL, where, params, "orders.created_at", "orders.id"
+    )
+    return render_template(
+        "orders.html", orders=rows, status=status, filters=filters, page=page
+    )
+
+
+# Tailors, categories, fields, icons and units change about once a week but
+# are read by every order form. Writers bump this sequence in their own
+# transaction; every process rebuilds its bundle when it sees a new value.
+REFERENCE_VERSION = "reference_data"
+
+
+def reference_version(conn: sqlite3.Connection) -> int:
+    return peek_sequence(conn, REFERENCE_VERSION) - 1
+
+
+def bump_reference_version(conn: sqlite3.Connection) -> None:
+    next_sequence(conn, REFERENCE_VERSION)
+
+
+def load_reference_data(conn: sqlite3.Connection, version: int) -> dict:
+    def rows(sql: str) -> list[dict]:
+        return [dict(row) for row in conn.execute(sql)]
+
+    measurement_fields = rows(
+        """
+        SELECT f.id, f.subcategory_id, f.field_key, f.field_label, f.sort_order,
+               s.name AS subcategory_name, c.name AS category_name
+        FROM measurement_fields f
+        JOIN subcategories s ON s.id = f.subcategory_id
+        JOIN categories c ON c.id = s.category_id
+        WHERE f.active = 1
+        ORDER BY c.name, s.name, f.sort_order, f.field_label
+        """
+    )
+    field_map: dict[str, list[dict]] = {}
+    for field in measurement_fields:
+        field_map.setdefault(str(field["subcategory_id"]), []).append(
+            {"id": field["id"], "key": field["field_key"], "label": field["field_label"]}
+        )
+    data = {
+        "version": version,
+        "tailors": rows(
+            "SELECT id, tailor_code, name, role, team, status FROM tailors ORDER BY team, name"
+        ),
+        "categories": rows("SELECT * FROM categories ORDER BY name"),
+        "subcategories": rows(
             """
-            SELECT orders.*, customers.name, customers.phone
-            FROM orders
-            JOIN customers ON customers.id = orders.customer_id
-            WHERE orders.status = ?
-            ORDER BY orders.created_at DESC
-            """,
-            (status,),
-        ).fetchall()
+            SELECT s.*, c.name AS category_name
+            FROM subcategories s
+            JOIN categories c ON c.id = s.category_id
+            ORDER BY c.name, s.name
+            """
+        ),
+        "measurement_fields": measurement_fields,
+        # subcategory id -> fields in form order, as the order form's JS reads it
+        "field_map": field_map,
+        "requirement_icons": rows("SELECT * FROM requirement_icons ORDER BY name"),
+        "uoms": rows("SELECT * FROM uoms ORDER BY name"),
+    }
+    payload = json.dumps(data, separators=(",", ":"))
+    return {
+        "data": data,
+        "json": payload,
+        "etag": hashlib.sha256(payload.encode()).hexdigest()[:32],
+    }
+
+
+def reference_data(conn: sqlite3.Connection) -> dict:
+    """The cached reference-data bundle: data, its JSON text and ETag."""
+    version = reference_version(conn)
+    return reference_cache.get_many(
+        [REFERENCE_VERSION],
+        lambda keys: {keys[0]: load_reference_data(conn, version)},
+        version=version,
+    )[REFERENCE_VERSION]
+
+
+@app.route("/api/reference-data")
+def api_reference_data():
+    bundle = reference_data(get_db())
+    if bundle["etag"] in request.if_none_match:
+        response = app.response_class(status=304)
     else:
-        rows = conn.execute(
-            """
-            SELECT orders.*, customers.name, customers.phone
-            FROM orders
-            JOIN customers ON customers.id = orders.customer_id
-            ORDER BY orders.created_at DESC
-            """
-        ).fetchall()
-    conn.close()
-    return render_template("orders.html", orders=rows, status=status)
+        response = app.response_class(bundle["json"], mimetype="application/json")
+    response.set_etag(bundle["etag"])
+    # The browser keeps its copy but asks every time; unchanged data is a 304.
+    response.cache_control.no_cache = True
+    return response
 
 
 @app.route("/orders/new", methods=["GET", "POST"])
 def order_new():
     conn = get_db()
-    tailors = conn.execute("SELECT * FROM tailors ORDER BY team, name").fetchall()
-    categories = conn.execute(
-        "SELECT * FROM categories ORDER BY name"
-    ).fetchall()
-    subcategories = conn.execute(
-        "SELECT * FROM subcategories ORDER BY name"
-    ).fetchall()
-    measurement_fields = conn.execute(
-        "SELECT * FROM measurement_fields ORDER BY subcategory_id, sort_order, field_label"
-    ).fetchall()
-    requirement_icons = conn.execute(
-        "SELECT * FROM requirement_icons ORDER BY name"
-    ).fetchall()
-    field_map = {}
-    for row in measurement_fields:
-        field_map.setdefault(str(row["subcategory_id"]), []).append(
-            {"key": row["field_key"], "label": row["field_label"]}
-        )
-    conn.close()
+    reference = reference_data(conn)["data"]
+    categories = reference["categories"]
+    subcategories = reference["subcategories"]
+    field_map = reference["field_map"]
+    form_context = {
+        "tailors": reference["tailors"],
+        "tailor_open_orders": tailor_open_orders(conn),
+        "categories": categories,
+        "subcategories": subcategories,
+        "measurement_fields": reference["measurement_fields"],
+        "measurement_field_map": field_map,
+        "requirement_icons": reference["requirement_icons"],
+    }
 
     if request.method == "POST":
         name = request.form.get("name", "").strip()
@@ -949,52 +3849,24 @@ def order_new():
         if not name or not phone:
             return render_template(
                 "order_new.html",
-                tailors=tailors,
-                categories=categories,
-                subcategories=subcategories,
-                measurement_fields=measurement_fields,
-                measurement_field_map=field_map,
-                requirement_icons=requirement_icons,
+                **form_context,
                 error="Customer name and phone are required.",
             )
 
-        customer_id = upsert_customer(name, phone, notes)
-        measure_fields = [
-            "neck",
-            "chest",
-            "waist",
-            "hip",
-            "shoulder",
-            "sleeve",
-            "length",
-            "cuff",
-            "inseam",
-            "outseam",
-            "thigh",
-            "knee",
-            "bottom",
-            "notes",
-        ]
-
         category_ids = request.form.getlist("measure_category_id")
         subcategory_ids = request.form.getlist("measure_subcategory_id")
         label_values = request.form.getlist("measure_label")
-        values_by_field = {field: request.form.getlist(f"measure_{field}") for field in measure_fields}
-
-        map_conn = get_db()
-        cat_rows = map_conn.execute("SELECT id, name FROM categories").fetchall()
-        sub_rows = map_conn.execute("SELECT id, name FROM subcategories").fetchall()
-        category_map = {str(row["id"]): row["name"] for row in cat_rows}
-        subcategory_map = {str(row["id"]): row["name"] for row in sub_rows}
-
-        max_len = max(
-            len(category_ids),
-            len(subcategory_ids),
-            len(label_values),
-            max((len(items) for items in values_by_field.values()), default=0),
-        )
-        for idx in range(max_len):
-            category_id = category_ids[idx].strip() if idx < len(category_ids) else ""
+        note_values = request.form.getlist("measure_notes")
+        category_map = {str(row["id"]): row["name"] for row in categories}
+        subcategory_map = {str(row["id"]): row["name"] for row in subcategories}
+
+        measurements = []
+        # Inputs are named measure_field_<field id>. Every block of one
+        # subcategory shows the same fields, so the n-th block of that
+        # subcategory owns the n-th value of each of them.
+        blocks_seen: dict[str, int] = {}
+        for idx, category_id in enumerate(category_ids):
+            category_id = category_id.strip()
             if not category_id:
                 continue
             subcategory_id = subcategory_ids[idx].strip() if idx < len(subcategory_ids) else ""
@@ -1002,26 +3874,32 @@ def order_new():
             subcategory_name = subcategory_map.get(subcategory_id, "")
             kind = f"{category_name} - {subcategory_name}" if subcategory_name else category_name
 
-            payload = {}
-            for field in measure_fields:
-                items = values_by_field.get(field, [])
-                payload[field] = items[idx].strip() if idx < len(items) and items[idx] else None
+            position = blocks_seen.get(subcategory_id, 0)
+            blocks_seen[subcategory_id] = position + 1
+            values = {}
+            for field in field_map.get(subcategory_id, []):
+                entered = request.form.getlist(f"measure_field_{field['id']}")
+                raw = entered[position].strip() if position < len(entered) else ""
+                if not raw:
+                    continue
+                try:
+                    values[field["id"]] = parse_measure(raw)
+                except ValueError:
+                    return render_template(
+                        "order_new.html",
+                        **form_context,
+                        error=f'{kind}: "{raw}" is not a valid {field["label"]} measurement.',
+                    )
 
+            measure_notes = note_values[idx].strip() if idx < len(note_values) else ""
             label = label_values[idx].strip() if idx < len(label_values) and label_values[idx] else ""
             if label:
-                notes = payload.get("notes") or ""
-                label_note = f"Label: {label}"
-                payload["notes"] = f"{label_note}\n{notes}".strip()
-
-            create_measurement(customer_id, kind, payload, map_conn)
+                measure_notes = f"Label: {label}\n{measure_notes}".strip()
 
-        map_conn.commit()
-        map_conn.close()
+            measurements.append(
+                (kind, int(subcategory_id) if subcategory_name else None, values, measure_notes or None)
+            )
 
-        due_date = request.form.get("due_date", "").strip() or None
-        priority = request.form.get("priority", "Normal")
-        status = request.form.get("status", "Pending")
-        assigned_tailor = request.form.get("assigned_tailor", "").strip() or None
         order_notes = request.form.get("order_notes", "").strip() or None
         requirements = [r.strip() for r in request.form.getlist("requirements") if r.strip()]
         if requirements:
@@ -1029,34 +3907,17 @@ def order_new():
             order_notes = f"{req_text}\n{order_notes}" if order_notes else req_text
         advance_amount = request.form.get("advance_amount", "").strip()
         total_amount = request.form.get("total_amount", "").strip()
-        advance_value = float(advance_amount) if advance_amount else None
-        total_value = float(total_amount) if total_amount else None
-
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO orders (
-                customer_id, due_date, status, priority,
-                assigned_team, assigned_tailor, notes,
-                advance_amount, total_amount, created_at
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                customer_id,
-                due_date,
-                status,
-                priority,
-                assigned_tailor,
-                order_notes,
-                advance_value,
-                total_value,
-                now_str(),
-            ),
-        )
-        order_id = cur.lastrowid
-
+        order = {
+            "due_date": request.form.get("due_date", "").strip() or None,
+            "status": request.form.get("status", "Pending"),
+            "priority": request.form.get("priority", "Normal"),
+            "assigned_tailor_id": request.form.get("assigned_tailor_id", type=int),
+            "notes": order_notes,
+            "advance_amount": float(advance_amount) if advance_amount else None,
+            "total_amount": float(total_amount) if total_amount else None,
+        }
+
+        items = []
         item_types = request.form.getlist("item_type")
         item_qtys = request.form.getlist("item_qty")
         item_notes = request.form.getlist("item_notes")
@@ -1065,86 +3926,92 @@ def order_new():
             if not item_type:
                 continue
             qty_value = int(qty) if qty.strip().isdigit() else 1
-            cur.execute(
-                "INSERT INTO order_items (order_id, item_type, qty, notes) VALUES (?, ?, ?, ?)",
-                (order_id, item_type, qty_value, note.strip() or None),
-            )
+            items.append((item_type, qty_value, note.strip() or None))
 
+        images = []
         files = request.files.getlist("order_images")
         labels = request.form.getlist("image_labels")
         seen = set()
         for i, file in enumerate(files):
             if not file or not file.filename:
                 continue
-            key = (file.filename, file.content_length)
-            if key in seen:
+            filename = store_upload(file.stream, file.filename)
+            if filename in seen:
                 continue
-            seen.add(key)
-            filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
-            filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-            file.save(filepath)
+            seen.add(filename)
             label = labels[i] if i < len(labels) else ""
-            cur.execute(
-                "INSERT INTO order_images (order_id, filename, label) VALUES (?, ?, ?)",
-                (order_id, filename, label),
-            )
-
-        conn.commit()
-        conn.close()
+            images.append((filename, label))
+
+        # Stored files may already be shared with other orders, so they are
+        # never removed here; if the order fails gc-uploads collects them.
+        order_id = create_order(
+            conn,
+            {"name": name, "phone": phone, "notes": notes},
+            measurements,
+            order,
+            items,
+            images,
+        )
         return redirect(url_for("order_detail", order_id=order_id))
 
-    return render_template(
-        "order_new.html",
-        tailors=tailors,
-        categories=categories,
-        subcategories=subcategories,
-        measurement_fields=measurement_fields,
-        measurement_field_map=field_map,
-        requirement_icons=requirement_icons,
+    return render_template("order_new.html", **form_context)
+
+EXPENSES_LIST_SQL = """
+    SELECT e.id,
+           e.expense_no,
+           e.expense_name,
+           e.amount,
+           e.created_at,
+           s.staff_no,
+           s.shift_no,
+           s.salary_amount
+    FROM expenses e
+    LEFT JOIN salaries s ON s.expense_id = e.id
+"""
+
+QUERY_PLAN_CHECKS.append(
+    (
+        "expense",
+        keyset_sql(EXPENSES_LIST_SQL, [], "e.created_at", "e.id", after=True),
+        ("2025-02-15 09:00", 1000, 51),
     )
+)
+
 
 @app.route("/expense")
 def expense_dashboard():
     filter_type = request.args.get("type", "all")  # all | expense | salary
     conn = get_db()
 
-    total_expense = conn.execute(
-        "SELECT COALESCE(SUM(amount), 0) FROM expenses"
-    ).fetchone()[0]
-
-    total_salary = conn.execute(
-        "SELECT COALESCE(SUM(salary_amount), 0) FROM salaries"
-    ).fetchone()[0]
-
-    base_query = """
-        SELECT e.id,
-               e.expense_no,
-               e.expense_name,
-               e.amount,
-               e.created_at,
-               s.staff_no,
-               s.shift_no,
-               s.salary_amount
-        FROM expenses e
-        LEFT JOIN salaries s ON s.expense_id = e.id
-    """
-
+    stats = read_stats(conn)
+    total_expense = stats.get("expense_total", 0)
+    total_salary = stats.get("salary_total", 0)
+
+    where, params, filters = column_filters(
+        {
+            "no": "e.expense_no",
+            "name": "e.expense_name",
+            "amount": "e.amount",
+            "staff": "s.staff_no",
+            "salary": "s.salary_amount",
+            "date": "e.created_at",
+        }
+    )
     if filter_type == "salary":
-        base_query += " WHERE s.id IS NOT NULL"
+        where.append("s.id IS NOT NULL")
     elif filter_type == "expense":
-        base_query += " WHERE s.id IS NULL"
-
-    base_query += " ORDER BY e.created_at DESC"
+        where.append("s.id IS NULL")
 
-    expenses = conn.execute(base_query).fetchall()
-    conn.close()
+    expenses, page = keyset_page(conn, EXPENSES_LIST_SQL, where, params, "e.created_at", "e.id")
 
     return render_template(
         "expense_dashboard.html",
         total_expense=total_expense,
         total_salary=total_salary,
         expenses=expenses,
-        filter_type=filter_type
+        filter_type=filter_type,
+        filters=filters,
+        page=page,
     )
 
 @app.route("/expense/add", methods=["GET", "POST"])
@@ -1157,7 +4024,7 @@ def expense_add():
         salary_amount = request.form.get("salary_amount", "").strip()
         is_salary = request.form.get("is_salary") == "1"
 
-        expense_no = generate_expense_no(conn)
+        expense_no = generate_expense_no(conn, preview=True)
 
         # ✅ PRIORITY VALIDATION
         if not name:
@@ -1186,6 +4053,7 @@ def expense_add():
 
         created_at = now_str()
         cur = conn.cursor()
+        expense_no = generate_expense_no(conn)
 
         # ✅ EXPENSE INSERT (single source of truth)
         cur.execute(
@@ -1219,19 +4087,10 @@ def expense_add():
             )
 
 
+        # ✅ RECEIPT IS RENDERED OFF THE REQUEST BY render_queue
+        render_queue.submit(conn, "expense_receipt", expense_id)
         conn.commit()
-        conn.close()
-
-        # ✅ PRINT USES FINAL PRIORITY AMOUNT
-        # generate_expense_pdf_80mm(expense_no, name, final_amount, created_at)
-        generate_expense_pdf_80mm(
-            expense_no,
-            name,
-            final_amount,
-            created_at,
-            is_salary=is_salary,
-            staff_no=request.form.get("staff_no")
-        )
+        render_queue.wake()
 
         return redirect(url_for("expense_dashboard"))
 
@@ -1239,15 +4098,13 @@ def expense_add():
     # conn.close()
     # return render_template("expense_add.html", expense_no=expense_no)
 
-    expense_no = generate_expense_no(conn)
+    expense_no = generate_expense_no(conn, preview=True)
 
     # ✅ FETCH STAFF LIST FOR DROPDOWN
     staffs = conn.execute(
         "SELECT tailor_code, name FROM tailors WHERE status = 'Active' ORDER BY name"
     ).fetchall()
 
-    conn.close()
-
     return render_template(
         "expense_add.html",
         expense_no=expense_no,
@@ -1270,14 +4127,12 @@ def expense_edit(expense_id: int):
         "SELECT tailor_code, name FROM tailors WHERE status = 'Active' ORDER BY name"
     ).fetchall()
     if not expense:
-        conn.close()
         return redirect(url_for("expense_dashboard"))
 
     if request.method == "POST":
         name = request.form.get("expense_name", "").strip()
         amount = request.form.get("expense_amount", "").strip()
         if not name or not amount:
-            conn.close()
             return render_template(
                 "expense_edit.html",
                 expense=expense,
@@ -1300,11 +4155,13 @@ def expense_edit(expense_id: int):
                 """,
                 (staff_no, shift_no, float(amount), expense_id),
             )
+        # The old receipt no longer matches the row; render the new one ahead
+        # of the next print.
+        render_queue.submit(conn, "expense_receipt", expense_id)
         conn.commit()
-        conn.close()
+        render_queue.wake()
         return redirect(url_for("expense_dashboard"))
 
-    conn.close()
     return render_template(
         "expense_edit.html",
         expense=expense,
@@ -1316,13 +4173,43 @@ def expense_edit(expense_id: int):
 @app.route("/expense/<int:expense_id>/delete", methods=["POST"])
 def expense_delete(expense_id: int):
     conn = get_db()
+    expense = conn.execute(
+        "SELECT expense_no FROM expenses WHERE id = ?", (expense_id,)
+    ).fetchone()
     conn.execute("DELETE FROM salaries WHERE expense_id = ?", (expense_id,))
     conn.execute("DELETE FROM expenses WHERE id = ?", (expense_id,))
     conn.commit()
-    conn.close()
+    if expense:
+        drop_cached_receipts(expense["expense_no"])
     return redirect(url_for("expense_dashboard"))
 
 
+@app.route("/expense/<int:expense_id>/receipt.pdf")
+def expense_receipt_pdf(expense_id: int):
+    receipt = load_receipt(get_db(), expense_id)
+    if receipt is None:
+        return "Expense not found", 404
+    row, digest = receipt
+    # The hash is known before touching the disk, so a printer that already
+    # has this version gets its 304 without a render.
+    if digest in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(digest)
+    else:
+        path = receipt_file(row, digest)
+        response = send_file(
+            path,
+            mimetype="application/pdf",
+            download_name=f"{row['expense_no']}.pdf",
+            etag=digest,
+            last_modified=os.path.getmtime(path),
+            conditional=True,
+        )
+    # Revalidate every time: the same URL serves the new receipt after an edit.
+    response.cache_control.no_cache = True
+    return response
+
+
 @app.route("/categories", methods=["GET", "POST"])
 def categories():
     if request.method == "POST":
@@ -1411,10 +4298,15 @@ def categories():
             field_keys = request.form.getlist("field_key")
             field_labels = request.form.getlist("field_label")
             if subcategory_id:
-                cur.execute(
-                    "DELETE FROM measurement_fields WHERE subcategory_id = ?",
-                    (subcategory_id,),
-                )
+                # Fields are updated in place: measurement_values point at
+                # their ids, so a field is only deleted once nothing uses it.
+                existing = {
+                    row[0]
+                    for row in cur.execute(
+                        "SELECT field_key FROM measurement_fields WHERE subcategory_id = ?",
+                        (subcategory_id,),
+                    )
+                }
                 used = set()
                 for idx, (key, label) in enumerate(
                     zip(field_keys, field_labels, strict=False)
@@ -1428,7 +4320,7 @@ def categories():
                         base = base[:12] if base else "field"
                         key = base
                         counter = 2
-                        while key in used:
+                        while key in used or key in existing:
                             key = f"{base}{counter}"
                             counter += 1
                     used.add(key)
@@ -1436,54 +4328,49 @@ def categories():
                         """
                         INSERT INTO measurement_fields (subcategory_id, field_key, field_label, sort_order)
                         VALUES (?, ?, ?, ?)
+                        ON CONFLICT (subcategory_id, field_key) DO UPDATE
+                        SET field_label = excluded.field_label,
+                            sort_order = excluded.sort_order,
+                            active = 1
                         """,
                         (subcategory_id, key, label, idx),
                     )
+                for key in existing - used:
+                    cur.execute(
+                        """
+                        DELETE FROM measurement_fields
+                        WHERE subcategory_id = ? AND field_key = ?
+                          AND NOT EXISTS (
+                              SELECT 1 FROM measurement_values WHERE field_id = measurement_fields.id
+                          )
+                        """,
+                        (subcategory_id, key),
+                    )
+                    cur.execute(
+                        "UPDATE measurement_fields SET active = 0 WHERE subcategory_id = ? AND field_key = ?",
+                        (subcategory_id, key),
+                    )
 
+        bump_reference_version(conn)
         conn.commit()
-        conn.close()
+        # Cached measurements carry field labels.
+        measurement_cache.clear()
         return redirect(url_for("categories"))
 
-    conn = get_db()
-    categories = conn.execute(
-        "SELECT * FROM categories ORDER BY name"
-    ).fetchall()
-    subcategories = conn.execute(
-        """
-        SELECT s.*, c.name as category_name
-        FROM subcategories s
-        JOIN categories c ON c.id = s.category_id
-        ORDER BY c.name, s.name
-        """
-    ).fetchall()
-    measurement_fields = conn.execute(
-        """
-        SELECT f.*, s.name as subcategory_name, c.name as category_name
-        FROM measurement_fields f
-        JOIN subcategories s ON s.id = f.subcategory_id
-        JOIN categories c ON c.id = s.category_id
-        ORDER BY c.name, s.name, f.sort_order
-        """
-    ).fetchall()
-    requirement_icons = conn.execute(
-        "SELECT * FROM requirement_icons ORDER BY name"
-    ).fetchall()
-    uoms = conn.execute("SELECT * FROM uoms ORDER BY name").fetchall()
-    field_map = {}
-    for row in measurement_fields:
-        field_map.setdefault(str(row["subcategory_id"]), {})[row["field_key"]] = row[
-            "field_label"
-        ]
-    conn.close()
+    reference = reference_data(get_db())["data"]
+    field_map = {
+        subcategory_id: {field["key"]: field["label"] for field in fields}
+        for subcategory_id, fields in reference["field_map"].items()
+    }
 
     return render_template(
         "categories.html",
-        categories=categories,
-        subcategories=subcategories,
-        measurement_fields=measurement_fields,
+        categories=reference["categories"],
+        subcategories=reference["subcategories"],
+        measurement_fields=reference["measurement_fields"],
         measurement_field_map=field_map,
-        requirement_icons=requirement_icons,
-        uoms=uoms,
+        requirement_icons=reference["requirement_icons"],
+        uoms=reference["uoms"],
     )
 
 @app.route("/api/staff/<staff_code>")
@@ -1493,18 +4380,296 @@ def get_staff_name(staff_code):
         "SELECT name FROM tailors WHERE tailor_code = ?",
         (staff_code,)
     ).fetchone()
-    conn.close()
 
     return {"name": row["name"] if row else ""}
 
 
+# /export/<name>.csv: (query, date column for ?from=&to=, id column).
+# Rows come out in date-index order so SQLite streams them without a sort.
+EXPORTS = {
+    "orders": (
+        """
+        SELECT orders.id, orders.created_at, customers.name AS customer, customers.phone,
+               orders.status, orders.priority, orders.due_date, orders.assigned_team,
+               orders.assigned_tailor, orders.advance_amount, orders.total_amount,
+               orders.paid_at, orders.completed_at, orders.picked_up_at, orders.notes
+        FROM orders
+        JOIN customers ON customers.id = orders.customer_id
+        """,
+        "orders.created_at",
+        "orders.id",
+    ),
+    "expenses": (
+        """
+        SELECT e.id, e.expense_no, e.created_at, e.expense_name, e.amount,
+               s.staff_no, s.shift_no, s.salary_amount
+        FROM expenses e
+        LEFT JOIN salaries s ON s.expense_id = e.id
+        """,
+        "e.created_at",
+        "e.id",
+    ),
+    "vendor_purchases": (
+        """
+        SELECT vp.id, vp.purchased_at, v.vendor_code, v.name AS vendor, vp.material_name,
+               vp.qty, uoms.name AS uom, vp.unit_price, vp.total_price
+        FROM vendor_purchases vp
+        JOIN vendors v ON v.id = vp.vendor_id
+        LEFT JOIN uoms ON uoms.id = vp.uom_id
+        """,
+        "vp.purchased_at",
+        "vp.id",
+    ),
+}
+EXPORT_FETCH_SIZE = 1000
+
+
+def export_query(name: str, date_from: str | None, date_to: str | None) -> tuple[str, list[str]]:
+    sql, date_column, id_column = EXPORTS[name]
+    clauses, params = [], []
+    if date_from:
+        clauses.append(f"{date_column} >= ?")
+        params.append(date_from)
+    if date_to:
+        # Timestamps are "YYYY-MM-DD HH:MM" text, so the end date is inclusive
+        # up to the start of the next day.
+        clauses.append(f"{date_column} < date(?, '+1 day')")
+        params.append(date_to)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return f"{sql} {where} ORDER BY {date_column}, {id_column}", params
+
+
+QUERY_PLAN_CHECKS.extend(
+    (f"export {name}", *export_query(name, "2025-01-01", "2025-01-31")) for name in EXPORTS
+)
+
+
+def csv_cell(value: object) -> object:
+    # Spreadsheets run text starting with these as formulas.
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@"):
+        return f"'{value}"
+    return value
+
+
+def iter_export_csv(name: str, date_from: str | None, date_to: str | None):
+    """Yield the export as CSV text, one fetchmany() batch per chunk.
+
+    Uses its own pooled connection: the response body is generated after
+    the request context, and with it g.db, has already been torn down.
+    """
+    sql, params = export_query(name, date_from, date_to)
+    conn = db_pool.acquire()
+    try:
+        cur = conn.execute(sql, params)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([column[0] for column in cur.description])
+        while True:
+            rows = cur.fetchmany(EXPORT_FETCH_SIZE)
+            if not rows:
+                break
+            writer.writerows([csv_cell(value) for value in row] for row in rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+        cur.close()
+    finally:
+        db_pool.release(conn)
+
+
+@app.route("/export/<name>.csv")
+def export_csv(name: str):
+    if name not in EXPORTS:
+        return f"Unknown export {name!r}", 404
+    dates = {}
+    for arg in ("from", "to"):
+        dates[arg] = request.args.get(arg, "").strip() or None
+        if dates[arg]:
+            try:
+                datetime.strptime(dates[arg], "%Y-%m-%d")
+            except ValueError:
+                return f"{arg} must be a date in YYYY-MM-DD form", 400
+    filename = "-".join([name, *(d for d in dates.values() if d)]) + ".csv"
+    return app.response_class(
+        iter_export_csv(name, dates["from"], dates["to"]),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.route("/api/db/pool")
+def db_pool_metrics():
+    return db_pool.metrics()
+
+
+@app.route("/api/render-jobs/<int:job_id>")
+def api_render_job(job_id: int):
+    job = get_db().execute(
+        """
+        SELECT id, kind, ref_id, status, attempts, output, last_error, created_at, updated_at
+        FROM render_jobs WHERE id = ?
+        """,
+        (job_id,),
+    ).fetchone()
+    if job is None:
+        return jsonify({"error": "not found"}), 404
+    payload = dict(job)
+    payload["url"] = render_job_url(job)
+    return jsonify(payload)
+
+
+def render_job_url(job: sqlite3.Row) -> str | None:
+    if job["status"] != "done":
+        return None
+    if job["kind"] == "expense_receipt":
+        # Cached files are renamed on edit; the route always serves the current one.
+        return url_for("expense_receipt_pdf", expense_id=job["ref_id"])
+    return url_for("static", filename=job["output"])
+
+
+SUGGEST_LIMIT = 8
+
+
+def suggest_customer_ids(conn: sqlite3.Connection, q: str) -> list[int]:
+    # Both paths stop after SUGGEST_LIMIT index entries instead of sorting
+    # every match: phone prefixes walk idx_customers_phone_digits, names walk
+    # the title doclist newest-first, so recent customers come up first.
+    digits = phone_query(q)
+    if digits:
+        rows = conn.execute(
+            f"""
+            SELECT id FROM customers
+            WHERE phone_digits >= ? AND phone_digits < ?
+            ORDER BY phone_digits
+            LIMIT {SUGGEST_LIMIT}
+            """,
+            phone_prefix_range(digits),
+        ).fetchall()
+    else:
+        match = fts_query(q)
+        if not match:
+            return []
+        rows = conn.execute(
+            f"""
+            SELECT rowid / 4 AS id FROM search_index
+            WHERE search_index MATCH ? AND rowid % 4 = 1
+            ORDER BY rowid DESC
+            LIMIT {SUGGEST_LIMIT}
+            """,
+            (f"title : ({match})",),
+        ).fetchall()
+    return [row["id"] for row in rows]
+
+
+def suggest_customers(conn: sqlite3.Connection, q: str) -> list[dict]:
+    ids = suggest_customer_ids(conn, q)
+    if not ids:
+        return []
+    marks = ",".join("?" * len(ids))
+    rows = conn.execute(
+        f"""
+        SELECT c.id, c.name, c.phone, c.notes,
+               o.id AS last_order_id, o.status AS last_order_status,
+               o.due_date AS last_order_due, o.created_at AS last_order_at
+        FROM customers c
+        LEFT JOIN orders o ON o.id = (
+            SELECT id FROM orders
+            WHERE customer_id = c.id
+            ORDER BY created_at DESC
+            LIMIT 1
+        )
+        WHERE c.id IN ({marks})
+        """,
+        ids,
+    ).fetchall()
+    rows.sort(key=lambda row: ids.index(row["id"]))
+
+    kinds: dict[int, list[tuple[str, str]]] = {}
+    for row in conn.execute(
+        f"""
+        SELECT customer_id, kind, MAX(created_at) AS last_at
+        FROM measurements
+        WHERE customer_id IN ({marks})
+        GROUP BY customer_id, kind
+        """,
+        [row["id"] for row in rows],
+    ):
+        kinds.setdefault(row["customer_id"], []).append((row["last_at"], row["kind"]))
+
+    results = []
+    for row in rows:
+        result = dict(row)
+        result["measurement_kinds"] = [
+            kind for _last_at, kind in sorted(kinds.get(row["id"], []), reverse=True)
+        ]
+        results.append(result)
+    return results
+
+
+@app.route("/api/customers/<int:customer_id>/measurements/latest")
+def api_customer_latest_measurements(customer_id: int):
+    measurements = latest_measurements(get_db(), [customer_id])[customer_id]
+    return jsonify({"customer_id": customer_id, "measurements": measurements})
+
+
+@app.route("/api/measurements/latest")
+def api_latest_measurements():
+    customer_ids = request.args.getlist("customer_id", type=int)
+    if len(customer_ids) > LATEST_MEASUREMENTS_BATCH:
+        return jsonify({"error": f"at most {LATEST_MEASUREMENTS_BATCH} customers per request"}), 400
+    latest = latest_measurements(get_db(), customer_ids) if customer_ids else {}
+    return jsonify(
+        {"customers": {str(customer_id): measurements for customer_id, measurements in latest.items()}}
+    )
+
+
+@app.route("/api/customers/suggest")
+def api_customer_suggest():
+    q = " ".join(request.args.get("q", "").split())
+    started = time.perf_counter()
+    results = []
+    if len(q) >= 2:
+        key = phone_query(q) or q.lower()
+        results = suggest_cache.get_or_load(key, lambda: suggest_customers(get_db(), q))
+    response = jsonify({"query": q, "results": results})
+    response.headers["Cache-Control"] = "private, max-age=30"
+    response.headers["Server-Timing"] = f"app;dur={(time.perf_counter() - started) * 1000:.1f}"
+    return response
+
+
+@app.route("/api/search")
+def api_search():
+    q = request.args.get("q", "").strip()
+    limit = min(request.args.get("limit", 20, type=int), 50)
+    return {"query": q, "results": search_everything(get_db(), q, max(limit, 1))}
+
+
+ORDER_DETAIL_SQL = """
+    SELECT orders.*, customers.name, customers.phone, customers.notes AS customer_notes
+    FROM orders
+    JOIN customers ON customers.id = orders.customer_id
+    WHERE orders.id = ?
+"""
+ORDER_ITEMS_SQL = "SELECT * FROM order_items WHERE order_id = ?"
+ORDER_IMAGES_SQL = "SELECT filename, label, derived_at FROM order_images WHERE order_id = ?"
+
+QUERY_PLAN_CHECKS.extend(
+    [
+        ("order_detail order", ORDER_DETAIL_SQL, (1,)),
+        ("order_detail items", ORDER_ITEMS_SQL, (1,)),
+        ("order_detail images", ORDER_IMAGES_SQL, (1,)),
+    ]
+)
+
 
 @app.route("/orders/<int:order_id>", methods=["GET", "POST"])
 def order_detail(order_id: int):
     conn = get_db()
     if request.method == "POST":
         status = request.form.get("status", "Pending")
-        assigned_tailor = request.form.get("assigned_tailor", "").strip() or None
+        tailor = find_tailor(conn, request.form.get("assigned_tailor_id", type=int))
         due_date = request.form.get("due_date", "").strip() or None
         notes = request.form.get("notes", "").strip() or None
         advance_amount = request.form.get("advance_amount", "").strip()
@@ -1530,14 +4695,16 @@ def order_detail(order_id: int):
         conn.execute(
             """
             UPDATE orders
-            SET status = ?, assigned_tailor = ?, due_date = ?, notes = ?,
+            SET status = ?, assigned_tailor = ?, assigned_tailor_id = ?,
+                due_date = ?, notes = ?,
                 advance_amount = ?, total_amount = ?, paid_at = ?,
                 completed_at = ?, picked_up_at = ?
             WHERE id = ?
             """,
             (
                 status,
-                assigned_tailor,
+                tailor["name"] if tailor else None,
+                tailor["id"] if tailor else None,
                 due_date,
                 notes,
                 float(advance_amount) if advance_amount else None,
@@ -1549,51 +4716,83 @@ def order_detail(order_id: int):
             ),
         )
         conn.commit()
-
-    order = conn.execute(
-        """
-        SELECT orders.*, customers.name, customers.phone, customers.notes AS customer_notes
-        FROM orders
-        JOIN customers ON customers.id = orders.customer_id
-        WHERE orders.id = ?
-        """,
-        (order_id,),
-    ).fetchone()
-    items = conn.execute(
-        "SELECT * FROM order_items WHERE order_id = ?", (order_id,)
-    ).fetchall()
-    tailors = conn.execute("SELECT * FROM tailors ORDER BY team, name").fetchall()
-    images = conn.execute(
-        "SELECT filename, label FROM order_images WHERE order_id = ?",
-        (order_id,),
-    ).fetchall()
-    conn.close()
+        dashboard_cache.clear()
+        suggest_cache.clear()
+
+    order = conn.execute(ORDER_DETAIL_SQL, (order_id,)).fetchone()
+    items = conn.execute(ORDER_ITEMS_SQL, (order_id,)).fetchall()
+    tailors = tailor_workloads(conn)
+    images = [
+        {
+            **row,
+            "full": url_for("static", filename=f"uploads/{row['filename']}"),
+            "thumb": url_for("static", filename=image_derivative(row["filename"], "thumb"))
+            if row["derived_at"] else None,
+            "preview": url_for("static", filename=image_derivative(row["filename"], "preview"))
+            if row["derived_at"] else None,
+        }
+        for row in map(dict, conn.execute(ORDER_IMAGES_SQL, (order_id,)))
+    ]
 
     return render_template(
         "order_detail.html", order=order, items=items, tailors=tailors, images=images
     )
 
+
+@app.route("/orders/<int:order_id>/ticket.pdf")
+def order_ticket_pdf(order_id: int):
+    buffer = io.BytesIO()
+    pages = render_order_tickets(buffer, iter_order_tickets(get_db(), "o.id = ?", (order_id,)))
+    if not pages:
+        return "Order not found", 404
+    buffer.seek(0)
+    return send_file(buffer, mimetype="application/pdf", download_name=f"order-{order_id}.pdf")
+
+
+@app.route("/orders/print-batch")
+def orders_print_batch():
+    due = request.args.get("due", "").strip() or datetime.now().strftime("%Y-%m-%d")
+    try:
+        datetime.strptime(due, "%Y-%m-%d")
+    except ValueError:
+        return "due must be a date in YYYY-MM-DD form", 400
+    # Rows come off the cursor one order at a time and each page is drawn as
+    # it arrives; the finished document spills to disk past 1 MB and is
+    # streamed from there, so the connection is released before the body goes out.
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    if not render_due_tickets(get_db(), due, spool):
+        spool.close()
+        return f"No open orders due on {due}", 404
+    spool.seek(0)
+    return send_file(spool, mimetype="application/pdf", download_name=f"tickets-{due}.pdf")
+
+
+@app.cli.command("print-batch")
+@click.option("--due", default=lambda: datetime.now().strftime("%Y-%m-%d"),
+              show_default="today", help="Due date to print, YYYY-MM-DD.")
+@click.option("--output", "output_path", type=click.Path(dir_okay=False),
+              help="PDF to write; defaults to tickets-<due>.pdf.")
+def print_batch_command(due: str, output_path: str | None) -> None:
+    try:
+        datetime.strptime(due, "%Y-%m-%d")
+    except ValueError:
+        raise click.BadParameter("use YYYY-MM-DD", param_hint="--due") from None
+    output_path = output_path or f"tickets-{due}.pdf"
+    with open(output_path, "wb") as output:
+        pages = render_due_tickets(get_db(), due, output)
+    if not pages:
+        os.remove(output_path)
+        click.echo(f"No open orders due on {due}.")
+        return
+    click.echo(f"Wrote {pages} tickets to {output_path}.")
+
+
 @app.route("/tailors")
 def tailors():
     conn = get_db()
 
-    rows = conn.execute(
-        """
-        SELECT 
-            t.id,
-            t.tailor_code,
-            t.name,
-            t.phone,
-            t.status,
-            o.id AS order_id,
-            o.due_date
-        FROM tailors t
-        LEFT JOIN orders o ON o.assigned_tailor = t.name
-        ORDER BY t.id DESC
-        """
-    ).fetchall()
+    rows = tailor_workloads(conn, order_by="t.id DESC")
 
-    conn.close()
     return render_template("tailors.html", tailors=rows, title="Tailors")
 
 
@@ -1607,7 +4806,7 @@ def tailor_add():
             VALUES (?, ?, ?, ?, ?, ?)
             """,
             (
-                request.form["tailor_code"],
+                generate_tailor_code(conn),
                 request.form["name"],
                 request.form["role"],
                 request.form["phone"],
@@ -1615,13 +4814,14 @@ def tailor_add():
                 request.form["role"],
             ),
         )
+        bump_reference_version(conn)
         conn.commit()
-        conn.close()
+        dashboard_cache.clear()
         return redirect(url_for("tailors"))
 
     return render_template(
         "tailor_add.html",
-        tailor_code=generate_tailor_code(),
+        tailor_code=generate_tailor_code(get_db(), preview=True),
         title="Add Tailor",
     )
 
@@ -1646,8 +4846,9 @@ def tailor_edit(tailor_id):
                 tailor_id,
             ),
         )
+        bump_reference_version(conn)
         conn.commit()
-        conn.close()
+        dashboard_cache.clear()
         return redirect(url_for("tailors"))
 
     tailor = conn.execute(
@@ -1655,27 +4856,47 @@ def tailor_edit(tailor_id):
         (tailor_id,),
     ).fetchone()
 
-    conn.close()
     return render_template("tailor_edit.html", tailor=tailor, title="Edit Tailor")
 
 
+CUSTOMERS_LIST_SQL = "SELECT * FROM customers"
+
+QUERY_PLAN_CHECKS.append(
+    (
+        "customers",
+        keyset_sql(CUSTOMERS_LIST_SQL, [], "name", "id", after=True, descending=False),
+        ("Customer 5", 10, 51),
+    )
+)
+
+
 @app.route("/customers")
 def customers():
     q = request.args.get("q", "").strip()
     conn = get_db()
+    where, params, filters = column_filters(
+        {"name": "name", "phone": "phone", "notes": "notes"}
+    )
     if q:
-        rows = conn.execute(
-            """
-            SELECT * FROM customers
-            WHERE name LIKE ? OR phone LIKE ?
-            ORDER BY name ASC
-            """,
-            (f"%{q}%", f"%{q}%"),
-        ).fetchall()
-    else:
-        rows = conn.execute("SELECT * FROM customers ORDER BY name ASC").fetchall()
-    conn.close()
-    return render_template("customers.html", customers=rows, q=q)
+        match_sql, match_params = customer_search_clause(q)
+        where.append(match_sql)
+        params.extend(match_params)
+    # Customers stay in alphabetical order, so the cursor is (name, id).
+    rows, page = keyset_page(
+        conn, CUSTOMERS_LIST_SQL, where, params, "name", "id", descending=False
+    )
+    return render_template(
+        "customers.html", customers=rows, q=q, filters=filters, page=page
+    )
+
+
+CUSTOMER_ORDERS_SQL = """
+    SELECT * FROM orders
+    WHERE customer_id = ?
+    ORDER BY created_at DESC
+"""
+
+QUERY_PLAN_CHECKS.append(("customer_detail orders", CUSTOMER_ORDERS_SQL, (1,)))
 
 
 @app.route("/customers/<int:customer_id>", methods=["GET", "POST"])
@@ -1686,23 +4907,17 @@ def customer_detail(customer_id: int):
         phone = request.form.get("phone", "").strip()
         if name and phone:
             conn.execute(
-                "UPDATE customers SET name = ?, phone = ? WHERE id = ?",
-                (name, phone, customer_id),
+                "UPDATE customers SET name = ?, phone = ?, phone_digits = ? WHERE id = ?",
+                (name, phone, normalize_phone(phone), customer_id),
             )
             conn.commit()
+            dashboard_cache.clear()
+            suggest_cache.clear()
 
     customer = conn.execute(
         "SELECT * FROM customers WHERE id = ?", (customer_id,)
     ).fetchone()
-    orders = conn.execute(
-        """
-        SELECT * FROM orders
-        WHERE customer_id = ?
-        ORDER BY created_at DESC
-        """,
-        (customer_id,),
-    ).fetchall()
-    conn.close()
+    orders = conn.execute(CUSTOMER_ORDERS_SQL, (customer_id,)).fetchall()
     return render_template(
         "customer_detail.html",
         customer=customer,
@@ -1710,6 +4925,16 @@ def customer_detail(customer_id: int):
     )
 
 
+INVENTORY_LIST_SQL = """
+    SELECT inventory.*, uoms.name AS uom_name
+    FROM inventory
+    LEFT JOIN uoms ON uoms.id = inventory.uom_id
+    ORDER BY inventory.name ASC
+"""
+
+QUERY_PLAN_CHECKS.append(("inventory", INVENTORY_LIST_SQL, ()))
+
+
 @app.route("/inventory", methods=["GET", "POST"])
 def inventory():
     conn = get_db()
@@ -1730,16 +4955,9 @@ def inventory():
                 ),
             )
         conn.commit()
+        dashboard_cache.clear()
 
-    items = conn.execute(
-        """
-        SELECT inventory.*, uoms.name AS uom_name
-        FROM inventory
-        LEFT JOIN uoms ON uoms.id = inventory.uom_id
-        ORDER BY inventory.name ASC
-        """
-    ).fetchall()
-    conn.close()
+    items = conn.execute(INVENTORY_LIST_SQL).fetchall()
     return render_template("inventory.html", items=items)
 
 
@@ -1756,7 +4974,6 @@ def inventory_add():
 
         has_item = any(name.strip() for name in names)
         if not has_item:
-            conn.close()
             return render_template(
                 "inventory_add.html",
                 uoms=uoms,
@@ -1764,33 +4981,67 @@ def inventory_add():
                 error="At least one item is required.",
             )
 
-        for name, vendor, qty, uom_id in zip(names, vendors_in, qtys, uoms_in, strict=False):
-            name = name.strip()
-            if not name:
-                continue
-            inventory_code = generate_inventory_code(conn, name)
-            conn.execute(
-                """
-                INSERT INTO inventory (inventory_code, name, supplier, qty, uom_id, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    inventory_code,
-                    name,
-                    vendor.strip() or None,
-                    int(qty or 0),
-                    int(uom_id or 0) or None,
-                    now_str(),
-                ),
-            )
+        rows = [
+            (name.strip(), vendor.strip() or None, int(qty or 0), int(uom_id or 0) or None)
+            for name, vendor, qty, uom_id in zip(names, vendors_in, qtys, uoms_in, strict=False)
+            if name.strip()
+        ]
+        codes = generate_inventory_codes(conn, [row[0] for row in rows])
+        updated_at = now_str()
+        conn.executemany(
+            """
+            INSERT INTO inventory (inventory_code, name, supplier, qty, uom_id, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [(code, *row, updated_at) for code, row in zip(codes, rows)],
+        )
 
         conn.commit()
-        conn.close()
+        dashboard_cache.clear()
         return redirect(url_for("inventory"))
-    conn.close()
     return render_template("inventory_add.html", uoms=uoms, vendors=vendors)
 
 
+@app.route("/inventory/import", methods=["GET", "POST"])
+def inventory_import():
+    result = None
+    error = None
+    if request.method == "POST":
+        upload = request.files.get("file")
+        qty_mode = request.form.get("qty_mode", "add")
+        if not upload or not upload.filename:
+            error = "Choose a CSV file to import."
+        else:
+            # Read straight off the upload stream; rows are never all in memory.
+            lines = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+            try:
+                result = import_inventory_csv(get_db(), lines, qty_mode=qty_mode)
+            except (ValueError, csv.Error, UnicodeDecodeError) as exc:
+                error = f"Could not import {upload.filename}: {exc}"
+    return render_template("inventory_import.html", result=result, error=error)
+
+
+@app.cli.command("import-inventory")
+@click.argument("csv_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch-size", default=IMPORT_BATCH_SIZE, show_default=True,
+              help="Rows upserted per transaction.")
+@click.option("--set-qty", is_flag=True, help="Replace quantities of existing items instead of adding to them.")
+def import_inventory_command(csv_path: str, batch_size: int, set_qty: bool) -> None:
+    with open(csv_path, encoding="utf-8-sig", newline="") as lines:
+        try:
+            result = import_inventory_csv(
+                get_db(), lines, batch_size=batch_size, qty_mode="set" if set_qty else "add"
+            )
+        except (ValueError, csv.Error) as exc:
+            raise click.ClickException(str(exc)) from None
+    for line, message in result["errors"]:
+        click.echo(f"line {line}: {message}", err=True)
+    click.echo(
+        f"{result['rows']} rows: {result['inserted']} inserted, "
+        f"{result['updated']} updated, {len(result['errors'])} rejected."
+    )
+
+
 @app.route("/inventory/<int:item_id>/edit", methods=["GET", "POST"])
 def inventory_edit(item_id: int):
     conn = get_db()
@@ -1801,12 +5052,10 @@ def inventory_edit(item_id: int):
     uoms = conn.execute("SELECT * FROM uoms ORDER BY name ASC").fetchall()
     vendors = conn.execute("SELECT * FROM vendors ORDER BY name ASC").fetchall()
     if not item:
-        conn.close()
         return redirect(url_for("inventory"))
     if request.method == "POST":
         name = request.form.get("name", "").strip()
         if not name:
-            conn.close()
             return render_template(
                 "inventory_edit.html",
                 item=item,
@@ -1830,9 +5079,8 @@ def inventory_edit(item_id: int):
             ),
         )
         conn.commit()
-        conn.close()
+        dashboard_cache.clear()
         return redirect(url_for("inventory"))
-    conn.close()
     return render_template("inventory_edit.html", item=item, uoms=uoms, vendors=vendors)
 
 
@@ -1841,46 +5089,103 @@ def inventory_delete(item_id: int):
     conn = get_db()
     conn.execute("DELETE FROM inventory WHERE id = ?", (item_id,))
     conn.commit()
-    conn.close()
+    dashboard_cache.clear()
     return redirect(url_for("inventory"))
 
 
+VENDORS_LIST_SQL = """
+    SELECT v.*,
+           (SELECT MAX(purchased_at) FROM vendor_purchases WHERE vendor_id = v.id) AS last_order_at,
+           (SELECT COALESCE(SUM(total_price), 0) FROM vendor_purchases WHERE vendor_id = v.id) AS spent
+    FROM vendors v
+"""
+
+VENDOR_PURCHASES_LIST_SQL = """
+    SELECT vp.*,
+           v.vendor_code,
+           v.name AS vendor_name,
+           uoms.name AS uom_name
+    FROM vendor_purchases vp
+    JOIN vendors v ON v.id = vp.vendor_id
+    LEFT JOIN uoms ON uoms.id = vp.uom_id
+"""
+
+QUERY_PLAN_CHECKS.extend(
+    [
+        (
+            "vendors",
+            keyset_sql(VENDORS_LIST_SQL, [], "v.created_at", "v.id", after=True),
+            ("2024-01-15 10:00", 50, 51),
+        ),
+        (
+            "vendor purchases",
+            keyset_sql(VENDOR_PURCHASES_LIST_SQL, [], "vp.purchased_at", "vp.id", after=True),
+            ("2025-01-15 10:00", 1000, 51),
+        ),
+    ]
+)
+
+
 @app.route("/vendors")
 def vendors():
     conn = get_db()
-    rows = conn.execute(
-        """
-        SELECT v.*,
-               (SELECT MAX(purchased_at) FROM vendor_purchases WHERE vendor_id = v.id) AS last_order_at,
-               (SELECT COALESCE(SUM(total_price), 0) FROM vendor_purchases WHERE vendor_id = v.id) AS spent
-        FROM vendors v
-        ORDER BY v.created_at DESC
-        """
-    ).fetchall()
-    purchases = conn.execute(
-        """
-        SELECT vp.*,
-               v.vendor_code,
-               v.name AS vendor_name,
-               uoms.name AS uom_name
-        FROM vendor_purchases vp
-        JOIN vendors v ON v.id = vp.vendor_id
-        LEFT JOIN uoms ON uoms.id = vp.uom_id
-        ORDER BY vp.purchased_at DESC
-        """
-    ).fetchall()
-    conn.close()
-    return render_template("vendors.html", vendors=rows, purchases=purchases)
+    where, params, filters = column_filters(
+        {
+            "code": "v.vendor_code",
+            "name": "v.name",
+            "phone": "v.phone",
+            "created": "v.created_at",
+            "recent": "(SELECT MAX(purchased_at) FROM vendor_purchases WHERE vendor_id = v.id)",
+            "spent": "(SELECT COALESCE(SUM(total_price), 0) FROM vendor_purchases WHERE vendor_id = v.id)",
+        }
+    )
+    rows, page = keyset_page(conn, VENDORS_LIST_SQL, where, params, "v.created_at", "v.id")
+    p_where, p_params, p_filters = column_filters(
+        {
+            "p_vendor": "v.name",
+            "p_material": "vp.material_name",
+            "p_qty": "vp.qty",
+            "p_uom": "uoms.name",
+            "p_unit_price": "vp.unit_price",
+            "p_total": "vp.total_price",
+            "p_purchased": "vp.purchased_at",
+        }
+    )
+    purchases, purchases_page = keyset_page(
+        conn,
+        VENDOR_PURCHASES_LIST_SQL,
+        p_where,
+        p_params,
+        "vp.purchased_at",
+        "vp.id",
+        cursor_arg="p_after",
+    )
+    # Each tab's filter form carries the other tab's state, so the tab it
+    # was submitted from is named explicitly.
+    active_tab = request.args.get("tab")
+    if active_tab not in ("vendors", "purchases"):
+        show_purchases = "p_after" in request.args or p_filters
+        active_tab = "purchases" if show_purchases else "vendors"
+    return render_template(
+        "vendors.html",
+        vendors=rows,
+        purchases=purchases,
+        vendor_filters=filters,
+        purchase_filters=p_filters,
+        filters={**filters, **p_filters},
+        page=page,
+        purchases_page=purchases_page,
+        active_tab=active_tab,
+    )
 
 
 @app.route("/vendors/add", methods=["GET", "POST"])
 def vendors_add():
     conn = get_db()
-    vendor_code = generate_vendor_code(conn)
+    vendor_code = generate_vendor_code(conn, preview=True)
     if request.method == "POST":
         name = request.form.get("name", "").strip()
         if not name:
-            conn.close()
             return render_template(
                 "vendors_add.html",
                 vendor_code=vendor_code,
@@ -1892,7 +5197,7 @@ def vendors_add():
             VALUES (?, ?, ?, ?, ?, ?)
             """,
             (
-                vendor_code,
+                generate_vendor_code(conn),
                 name,
                 request.form.get("phone", "").strip() or None,
                 request.form.get("email", "").strip() or None,
@@ -1901,9 +5206,7 @@ def vendors_add():
             ),
         )
         conn.commit()
-        conn.close()
         return redirect(url_for("vendors"))
-    conn.close()
     return render_template("vendors_add.html", vendor_code=vendor_code)
 
 
@@ -1915,12 +5218,10 @@ def vendors_edit(vendor_id: int):
         (vendor_id,),
     ).fetchone()
     if not vendor:
-        conn.close()
         return redirect(url_for("vendors"))
     if request.method == "POST":
         name = request.form.get("name", "").strip()
         if not name:
-            conn.close()
             return render_template(
                 "vendors_edit.html",
                 vendor=vendor,
@@ -1941,9 +5242,7 @@ def vendors_edit(vendor_id: int):
             ),
         )
         conn.commit()
-        conn.close()
         return redirect(url_for("vendors"))
-    conn.close()
     return render_template("vendors_edit.html", vendor=vendor)
 
 
@@ -1953,7 +5252,7 @@ def vendors_delete(vendor_id: int):
     conn.execute("DELETE FROM vendor_purchases WHERE vendor_id = ?", (vendor_id,))
     conn.execute("DELETE FROM vendors WHERE id = ?", (vendor_id,))
     conn.commit()
-    conn.close()
+    dashboard_cache.clear()
     return redirect(url_for("vendors"))
 
 
@@ -1970,7 +5269,6 @@ def vendors_add_purchase():
         prices = request.form.getlist("unit_price")
 
         if not vendor_id:
-            conn.close()
             return render_template(
                 "vendors_purchase_add.html",
                 vendors=vendors,
@@ -1980,7 +5278,6 @@ def vendors_add_purchase():
 
         has_item = any(name.strip() for name in materials)
         if not has_item:
-            conn.close()
             return render_template(
                 "vendors_purchase_add.html",
                 vendors=vendors,
@@ -2012,10 +5309,9 @@ def vendors_add_purchase():
             )
 
         conn.commit()
-        conn.close()
+        dashboard_cache.clear()
         return redirect(url_for("vendors"))
 
-    conn.close()
     return render_template("vendors_purchase_add.html", vendors=vendors, uoms=uoms)
 
 
@@ -2029,7 +5325,6 @@ def vendors_purchase_edit(purchase_id: int):
     vendors = conn.execute("SELECT * FROM vendors ORDER BY name ASC").fetchall()
     uoms = conn.execute("SELECT * FROM uoms ORDER BY name ASC").fetchall()
     if not purchase:
-        conn.close()
         return redirect(url_for("vendors"))
     if request.method == "POST":
         vendor_id = request.form.get("vendor_id")
@@ -2038,7 +5333,6 @@ def vendors_purchase_edit(purchase_id: int):
         price_val = float(request.form.get("unit_price", "0") or 0)
         uom_id = int(request.form.get("uom_id") or 0) or None
         if not vendor_id or not material_name:
-            conn.close()
             return render_template(
                 "vendors_purchase_edit.html",
                 purchase=purchase,
@@ -2064,9 +5358,8 @@ def vendors_purchase_edit(purchase_id: int):
             ),
         )
         conn.commit()
-        conn.close()
+        dashboard_cache.clear()
         return redirect(url_for("vendors"))
-    conn.close()
     return render_template(
         "vendors_purchase_edit.html",
         purchase=purchase,
@@ -2080,10 +5373,11 @@ def vendors_purchase_delete(purchase_id: int):
     conn = get_db()
     conn.execute("DELETE FROM vendor_purchases WHERE id = ?", (purchase_id,))
     conn.commit()
-    conn.close()
+    dashboard_cache.clear()
     return redirect(url_for("vendors"))
 
 
 if __name__ == "__main__":
-    init_db()
+    with app.app_context():
+        init_db()
     app.run(debug=True)
@@ -98,7 +98,7 @@ function wireMeasureInputs(container) {
         const label = document.createElement("label");
         label.innerHTML = `
           <span class="field-label" data-field-key="${field.key}">${field.label}</span>
-          <input class="measure-input" type="text" name="measure_${field.key}" />
+          <input class="measure-input" type="text" name="measure_field_${field.id}" />
         `;
         fieldsWrap.appendChild(label);
       });
@@ -121,11 +121,55 @@ document.querySelectorAll(".add-measure").forEach((button) => {
       return;
     }
     const clone = template.content.cloneNode(true);
+    const block = clone.querySelector(".measurement-block");
     list.appendChild(clone);
-    wireMeasureInputs(list);
+    // Only the new block: re-wiring the list would re-render the fields of
+    // the blocks above it and lose what was typed there.
+    wireMeasureInputs(block);
   });
 });
 
+// Fill a new size set from a stored measurement (see /api/measurements/latest).
+function prefillMeasurement(measurement) {
+  const list = document.querySelector(`.measurement-list[data-kind="${measurement.category_id}"]`);
+  const template = document.getElementById(`measure-template-${measurement.category_id}`);
+  if (!list || !template || !measurement.subcategory_id) {
+    return;
+  }
+  list.querySelectorAll(".measurement-block").forEach((candidate) => {
+    const select = candidate.querySelector(".subcategory-select");
+    const notes = candidate.querySelector("textarea[name='measure_notes']");
+    if (!candidate.dataset.prefilled && select && !select.value && notes && !notes.value.trim()) {
+      candidate.remove();
+    }
+  });
+  const clone = template.content.cloneNode(true);
+  const block = clone.querySelector(".measurement-block");
+  list.appendChild(clone);
+  wireMeasureInputs(block);
+  block.dataset.prefilled = measurement.id;
+
+  const select = block.querySelector(".subcategory-select");
+  select.value = String(measurement.subcategory_id);
+  select.dispatchEvent(new Event("change"));
+  measurement.values.forEach((item) => {
+    const input = block.querySelector(`[name="measure_field_${item.field_id}"]`);
+    if (input) {
+      input.value = item.display;
+    }
+  });
+
+  // order_new saves the size-set label as the first line of the notes.
+  let notes = measurement.notes || "";
+  if (notes.startsWith("Label: ")) {
+    const [labelLine, ...rest] = notes.split("\n");
+    block.querySelector(".measure-label-input").value = labelLine.slice("Label: ".length);
+    notes = rest.join("\n");
+  }
+  block.querySelector("textarea[name='measure_notes']").value = notes;
+  block.querySelector(".measurement-title").textContent += ` · from ${measurement.created_at}`;
+}
+
 document.addEventListener("click", (event) => {
   const itemBtn = event.target.closest(".item-delete");
   if (itemBtn) {
@@ -219,7 +263,7 @@ if (toggleBtn && sidebar && main) {
 }
 
 document.querySelectorAll(".table-wrap").forEach((wrap) => {
-  const filters = Array.from(wrap.querySelectorAll(".table-filters input"));
+  const filters = Array.from(wrap.querySelectorAll(".table-filters input:not([type=hidden])"));
   const rows = Array.from(wrap.querySelectorAll(".table-row")).filter(
     (row) => !row.classList.contains("table-head")
   );
@@ -322,3 +366,107 @@ if (vendorTable && vendorFilters.length) {
     input.addEventListener("input", applyVendorFilters);
   });
 }
+
+const customerLookup = document.querySelector(".customer-lookup");
+if (customerLookup) {
+  const suggestUrl = customerLookup.dataset.suggestUrl;
+  const nameInput = document.getElementById("customer-name");
+  const phoneInput = document.getElementById("customer-phone");
+  const notesInput = document.getElementById("customer-notes");
+  const list = document.getElementById("customer-suggest");
+  const cache = new Map();
+  let timer = null;
+  let pending = null;
+
+  const hideSuggestions = () => {
+    list.hidden = true;
+    list.innerHTML = "";
+  };
+
+  const renderSuggestions = (results) => {
+    list.innerHTML = "";
+    if (!results.length) {
+      hideSuggestions();
+      return;
+    }
+    results.forEach((customer) => {
+      const item = document.createElement("li");
+      const lastOrder = customer.last_order_id
+        ? `Last order #${customer.last_order_id} (${customer.last_order_status})`
+        : "No orders yet";
+      const kinds = customer.measurement_kinds.length
+        ? customer.measurement_kinds.join(", ")
+        : "No measurements";
+      item.innerHTML = `
+        <strong></strong> <span class="muted"></span>
+        <div class="muted suggest-meta"></div>
+      `;
+      item.querySelector("strong").textContent = customer.name;
+      item.querySelector("span").textContent = customer.phone;
+      item.querySelector(".suggest-meta").textContent = `${lastOrder} · ${kinds}`;
+      item.addEventListener("mousedown", (event) => {
+        event.preventDefault();
+        nameInput.value = customer.name;
+        phoneInput.value = customer.phone;
+        if (notesInput && !notesInput.value) {
+          notesInput.value = customer.notes || "";
+        }
+        hideSuggestions();
+        customerLookup.dispatchEvent(new CustomEvent("customer-selected", { detail: customer }));
+      });
+      list.appendChild(item);
+    });
+    list.hidden = false;
+  };
+
+  const lookup = (query) => {
+    if (cache.has(query)) {
+      renderSuggestions(cache.get(query));
+      return;
+    }
+    if (pending) {
+      pending.abort();
+    }
+    pending = new AbortController();
+    fetch(`${suggestUrl}?q=${encodeURIComponent(query)}`, { signal: pending.signal })
+      .then((response) => response.json())
+      .then((data) => {
+        cache.set(query, data.results);
+        renderSuggestions(data.results);
+      })
+      .catch(() => {});
+  };
+
+  const measurementsUrl = customerLookup.dataset.measurementsUrl;
+  let prefilledFor = null;
+  if (measurementsUrl) {
+    customerLookup.addEventListener("customer-selected", (event) => {
+      const customer = event.detail;
+      if (!customer.id || customer.id === prefilledFor) {
+        return;
+      }
+      fetch(`${measurementsUrl}?customer_id=${customer.id}`)
+        .then((response) => response.json())
+        .then((data) => {
+          prefilledFor = customer.id;
+          // Sets loaded for a previously picked customer are not this one's.
+          document.querySelectorAll(".measurement-block[data-prefilled]").forEach((block) => block.remove());
+          (data.customers[customer.id] || []).forEach(prefillMeasurement);
+        })
+        .catch(() => {});
+    });
+  }
+
+  [nameInput, phoneInput].forEach((input) => {
+    input.addEventListener("input", () => {
+      clearTimeout(timer);
+      const query = input.value.trim();
+      if (query.length < 2) {
+        hideSuggestions();
+        return;
+      }
+      timer = setTimeout(() => lookup(query), 200);
+    });
+    input.addEventListener("blur", hideSuggestions);
+  });
+}
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# app opens its connection pool at import time, so point it at a scratch
+# database before any test module imports it.
+os.environ["TAILOR_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "tailor.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,57 @@
+import sqlite3
+
+import pytest
+
+import app as tailor
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "inventory.db")
+    conn.row_factory = sqlite3.Row
+    tailor.init_db(conn)
+    conn.execute("DELETE FROM inventory")
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def stock(conn):
+    return {row["name"]: row["qty"] for row in conn.execute("SELECT name, qty FROM inventory")}
+
+
+def test_rows_without_a_code_update_the_item_with_that_name(conn):
+    tailor.import_inventory_csv(conn, ["name,qty\n", "Silk,3\n"])
+
+    result = tailor.import_inventory_csv(conn, ["name,qty\n", "Silk,2\n", "Linen,4\n"])
+
+    assert (result["inserted"], result["updated"]) == (1, 1)
+    assert stock(conn) == {"Silk": 5, "Linen": 4}
+
+
+def test_failing_rows_are_skipped_and_the_rest_of_the_batch_kept(conn):
+    # Stands in for any constraint a single row can break.
+    conn.execute(
+        """
+        CREATE TEMP TRIGGER reject_broken BEFORE INSERT ON inventory
+        WHEN NEW.name = 'Broken'
+        BEGIN
+            SELECT RAISE(ABORT, 'rejected');
+        END
+        """
+    )
+    lines = [
+        "name,qty\n",
+        "Cotton,1\n",
+        "Broken,1\n",
+        "Denim,x\n",
+        "Wool,²\n",
+        "Felt,99999999999999999999\n",
+        "Satin,2\n",
+    ]
+
+    result = tailor.import_inventory_csv(conn, lines, batch_size=10)
+
+    assert stock(conn) == {"Cotton": 1, "Satin": 2}
+    assert result["inserted"] == 2
+    assert sorted(line for line, _message in result["errors"]) == [3, 4, 5, 6]
@@ -0,0 +1,60 @@
+import sqlite3
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import app as tailor
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "pages.db")
+    conn.row_factory = sqlite3.Row
+    tailor.init_db(conn)
+    conn.execute("DELETE FROM customers")
+    # Repeated names and timestamps, so only the id tiebreak keeps pages apart.
+    conn.executemany(
+        "INSERT INTO customers (name, phone, created_at) VALUES (?, ?, ?)",
+        [(f"Customer {i % 4}", f"9{i:09d}", "2025-01-01 10:00") for i in range(23)],
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def walk(conn, path, **keyset):
+    """Follow the next links from ``path``; returns each page's ids and links."""
+    pages = []
+    while path:
+        with tailor.app.test_request_context(path):
+            rows, page = tailor.keyset_page(conn, tailor.CUSTOMERS_LIST_SQL, [], [], **keyset)
+        pages.append(([row["id"] for row in rows], page))
+        path = page["next"]
+    return pages
+
+
+@pytest.mark.parametrize(
+    "keyset, order_by",
+    [
+        ({"sort_column": "name", "id_column": "id", "descending": False}, "name, id"),
+        ({"sort_column": "created_at", "id_column": "id"}, "created_at DESC, id DESC"),
+    ],
+)
+def test_pages_cover_every_row_once(conn, keyset, order_by):
+    expected = [row[0] for row in conn.execute(f"SELECT id FROM customers ORDER BY {order_by}")]
+
+    pages = walk(conn, "/customers?limit=5", **keyset)
+
+    assert [len(ids) for ids, _page in pages] == [5, 5, 5, 5, 3]
+    assert [row_id for ids, _page in pages for row_id in ids] == expected
+
+
+def test_first_link_returns_to_the_first_page(conn):
+    keyset = {"sort_column": "name", "id_column": "id", "descending": False}
+    pages = walk(conn, "/customers?limit=5", **keyset)
+    first_ids, first_page = pages[0]
+    assert first_page["first"] is None
+
+    back = pages[2][1]["first"]
+    assert parse_qs(urlsplit(back).query) == {"limit": ["5"]}
+    assert walk(conn, back, **keyset)[0][0] == first_ids
@@ -0,0 +1,64 @@
+import pytest
+
+import app as tailor
+
+
+@pytest.fixture(scope="module")
+def client():
+    with tailor.app.app_context():
+        tailor.init_db()
+    client = tailor.app.test_client()
+    client.post(
+        "/categories",
+        data={
+            "action": "save_fields",
+            "fields_subcategory_id": "1",
+            "field_key": [""],
+            "field_label": ["Neck"],
+        },
+    )
+    return client
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [("15 1/2", 15.5), ("15-1/2", 15.5), ("15½", 15.5), ("15.5", 15.5), (16, 16.0)],
+)
+def test_parse_measure(raw, expected):
+    assert tailor.parse_measure(raw) == expected
+
+
+@pytest.mark.parametrize("raw", ["1e400", "-5", "0", "1/0", "", -2.0, float("nan")])
+def test_parse_measure_rejects(raw):
+    with pytest.raises(ValueError):
+        tailor.parse_measure(raw)
+
+
+@pytest.mark.parametrize("raw", ["1e400", "-5"])
+def test_order_new_rejects_bad_measurement(client, raw):
+    with tailor.app.app_context():
+        conn = tailor.get_db()
+        field_id = conn.execute(
+            "SELECT id FROM measurement_fields WHERE subcategory_id = 1 AND active = 1"
+        ).fetchone()[0]
+        before = conn.execute("SELECT COUNT(*) FROM measurement_values").fetchone()[0]
+
+    response = client.post(
+        "/orders/new",
+        data={
+            "name": "Measure Check",
+            "phone": "555-0100",
+            "item_type": ["Shirt"],
+            "item_qty": ["1"],
+            "item_notes": [""],
+            "measure_category_id": ["1"],
+            "measure_subcategory_id": ["1"],
+            f"measure_field_{field_id}": [raw],
+        },
+    )
+
+    assert response.status_code == 200
+    assert b"is not a valid" in response.data
+    with tailor.app.app_context():
+        after = tailor.get_db().execute("SELECT COUNT(*) FROM measurement_values").fetchone()[0]
+    assert after == before
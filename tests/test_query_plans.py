@@ -0,0 +1,25 @@
+import sqlite3
+
+import pytest
+
+import app as tailor
+
+
+@pytest.fixture(scope="module")
+def bench_db(tmp_path_factory):
+    conn = sqlite3.connect(tmp_path_factory.mktemp("plans") / "plans.db")
+    conn.row_factory = sqlite3.Row
+    tailor.init_db(conn)
+    # The size check-query-plans uses; the planner's choices depend on it.
+    tailor.seed_benchmark_db(conn, 20000)
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize(
+    "name, sql, params",
+    tailor.QUERY_PLAN_CHECKS,
+    ids=[name for name, _sql, _params in tailor.QUERY_PLAN_CHECKS],
+)
+def test_no_full_table_scan(bench_db, name, sql, params):
+    assert tailor.full_scans(bench_db, sql, params) == []
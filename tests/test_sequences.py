@@ -0,0 +1,53 @@
+import sqlite3
+import threading
+
+import app as tailor
+
+
+def scratch_db(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    tailor.init_db(conn)
+    conn.execute("PRAGMA journal_mode = WAL")
+    return conn
+
+
+def test_next_sequence_is_unique_across_connections(tmp_path):
+    path = tmp_path / "sequences.db"
+    scratch_db(path).close()
+    numbers, errors = [], []
+
+    def take_numbers():
+        conn = sqlite3.connect(path, timeout=30)
+        try:
+            for _ in range(25):
+                conn.execute("BEGIN IMMEDIATE")
+                numbers.append(tailor.next_sequence(conn, "test_no"))
+                conn.commit()
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=take_numbers) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(numbers) == list(range(1, 201))
+
+
+def test_next_sequence_reserves_blocks_and_returns_them_on_rollback(tmp_path):
+    conn = scratch_db(tmp_path / "sequences.db")
+    conn.execute("BEGIN IMMEDIATE")
+    assert tailor.next_sequence(conn, "test_no", count=5) == 1
+    conn.commit()
+
+    conn.execute("BEGIN IMMEDIATE")
+    assert tailor.next_sequence(conn, "test_no") == 6
+    conn.rollback()
+
+    assert tailor.peek_sequence(conn, "test_no") == 6
+    conn.close()
@@ -0,0 +1,86 @@
+import io
+import os
+import sqlite3
+import time
+
+import pytest
+
+import app as tailor
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    folder = tmp_path / "uploads"
+    (folder / "derived").mkdir(parents=True)
+    monkeypatch.setitem(tailor.app.config, "UPLOAD_FOLDER", str(folder))
+    return folder
+
+
+@pytest.fixture
+def client():
+    with tailor.app.app_context():
+        tailor.init_db()
+    return tailor.app.test_client()
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "uploads.db")
+    conn.row_factory = sqlite3.Row
+    tailor.init_db(conn)
+    yield conn
+    conn.close()
+
+
+def refcounts(conn):
+    return dict(conn.execute("SELECT filename, refcount FROM upload_blobs").fetchall())
+
+
+def make_upload(folder, filename):
+    paths = [folder / filename] + [
+        folder / "derived" / os.path.basename(tailor.image_derivative(filename, kind))
+        for kind in tailor.IMAGE_DERIVATIVES
+    ]
+    old = time.time() - 60
+    for path in paths:
+        path.write_bytes(b"x")
+        os.utime(path, (old, old))
+    return paths
+
+
+def test_garbage_collection_keeps_only_referenced_uploads(conn, uploads):
+    kept, dropped = "a" * 64 + ".jpg", "b" * 64 + ".jpg"
+    kept_paths, dropped_paths = make_upload(uploads, kept), make_upload(uploads, dropped)
+    (uploads / "notes.txt").write_bytes(b"not an upload")
+    order_id = conn.execute("SELECT MIN(id) FROM orders").fetchone()[0]
+
+    for filename in (kept, kept, dropped):
+        conn.execute(
+            "INSERT INTO order_images (order_id, filename) VALUES (?, ?)", (order_id, filename)
+        )
+    assert refcounts(conn) == {kept: 2, dropped: 1}
+
+    conn.execute("DELETE FROM order_images WHERE filename = ?", (dropped,))
+    conn.execute("DELETE FROM order_images WHERE id = (SELECT MIN(id) FROM order_images)")
+    conn.commit()
+    assert refcounts(conn) == {kept: 1, dropped: 0}
+
+    assert tailor.collect_upload_garbage(conn, grace=0) == (3, 3)
+
+    assert all(path.exists() for path in kept_paths)
+    assert not any(path.exists() for path in dropped_paths)
+    assert (uploads / "notes.txt").exists()
+    assert refcounts(conn) == {kept: 1}
+
+
+def test_files_over_the_size_limit_are_refused(client, uploads, monkeypatch):
+    monkeypatch.setitem(tailor.app.config, "MAX_UPLOAD_FILE_SIZE", 1024)
+
+    response = client.post(
+        "/orders/new",
+        data={"order_images": (io.BytesIO(b"x" * 2048), "photo.jpg")},
+        content_type="multipart/form-data",
+    )
+
+    assert response.status_code == 413
+    assert not [name for name in os.listdir(uploads) if name.startswith(".incoming-")]